@@ -0,0 +1,123 @@
+import json
+import logging
+import os
+import shutil
+import threading
+from collections import OrderedDict
+from io import BytesIO
+from PIL import Image
+from config.image_constants import ASSET_CACHE_DIR, ASSET_MEMORY_BUDGET
+
+class AssetCache:
+    """
+    Two-tier cache for Data Dragon assets of the current ddragon version.
+    Raw files live on disk under `<root>/<version>/<asset path>`; decoded PIL images are kept in an
+    in-memory LRU bounded by `memory_budget` bytes of pixel data. Switching to a new version
+    drops the memory tier and deletes the directories of versions older than the previous one;
+    the previous version is kept, as other bot processes may still be using it.
+    """
+    def __init__(self, root: str = ASSET_CACHE_DIR, memory_budget: int = ASSET_MEMORY_BUDGET):
+        self.root = root
+        self.memory_budget = memory_budget
+        self.version: str | None = None
+        self.skins: dict[str, list[int]] = {}  # champion -> skin numbers, filled from champion JSON
+        self.hits = 0
+        self.misses = 0
+        self.logger = logging.getLogger(__name__)
+        self._images: OrderedDict[str, Image.Image] = OrderedDict()
+        self._memory_used = 0
+        self._lock = threading.Lock()
+
+    def _disk_path(self, path: str) -> str:
+        return os.path.join(self.root, self.version or "unknown", *path.split("/"))
+
+    @staticmethod
+    def _image_size(image: Image.Image) -> int:
+        return image.width * image.height * len(image.getbands())
+
+    @staticmethod
+    def _version_key(version: str) -> tuple[int, ...] | None:
+        """"14.20.1" -> (14, 20, 1); None for directory names that aren't a ddragon version."""
+        parts = version.split(".")
+        return tuple(int(part) for part in parts) if all(part.isdigit() for part in parts) else None
+
+    def set_version(self, version: str):
+        """Switch to `version`, purging the memory tier and on-disk versions before the previous one if it changed."""
+        if version == self.version:
+            return
+        self.logger.info(f"Data Dragon version changed {self.version} -> {version}, purging asset cache")
+        with self._lock:
+            self.version = version
+            self._images.clear()
+            self._memory_used = 0
+            self.skins.clear()
+        if not os.path.isdir(self.root) or self._version_key(version) is None:
+            return
+        older = sorted(
+            (key, entry) for entry in os.listdir(self.root)
+            if (key := self._version_key(entry)) is not None and key < self._version_key(version)
+        )
+        for _, entry in older[:-1]:  # the newest older version is the previous patch, still in use elsewhere
+            shutil.rmtree(os.path.join(self.root, entry), ignore_errors=True)
+
+    def get_image(self, path: str) -> Image.Image | None:
+        """Return a copy of a decoded image from the memory tier, or None."""
+        with self._lock:
+            image = self._images.get(path)
+            if image is None:
+                self.misses += 1
+                return None
+            self._images.move_to_end(path)
+            self.hits += 1
+            return image.copy()
+
+    def add_image(self, path: str, data: bytes) -> Image.Image:
+        """Decode `data`, keep it in the memory tier and return a copy for the caller to draw on."""
+        image = Image.open(BytesIO(data))
+        image.load()
+        size = self._image_size(image)
+        with self._lock:
+            if path in self._images:
+                self._memory_used -= self._image_size(self._images.pop(path))
+            if size <= self.memory_budget:
+                self._images[path] = image
+                self._memory_used += size
+            while self._memory_used > self.memory_budget:
+                _, evicted = self._images.popitem(last=False)
+                self._memory_used -= self._image_size(evicted)
+        return image.copy()
+
+    def read(self, path: str) -> bytes | None:
+        """Return the raw bytes of a cached asset from disk, or None."""
+        try:
+            with open(self._disk_path(path), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def write(self, path: str, data: bytes):
+        """Store the raw bytes of an asset on disk."""
+        disk_path = self._disk_path(path)
+        os.makedirs(os.path.dirname(disk_path), exist_ok=True)
+        tmp_path = f"{disk_path}.{os.getpid()}.{threading.get_ident()}.tmp"  # unique across bot processes
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, disk_path)  # atomic, so readers never see a partial file
+
+    def read_json(self, path: str):
+        data = self.read(path)
+        return json.loads(data) if data is not None else None
+
+    def write_json(self, path: str, value):
+        self.write(path, json.dumps(value, separators=(",", ":")).encode("utf-8"))
+
+    def stats(self) -> dict[str, int]:
+        """Return memory-tier counters."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "images": len(self._images),
+                "memory_used": self._memory_used,
+                "skin_lists": len(self.skins),
+            }
@@ -0,0 +1,233 @@
+"""
+Local stand-in for the Riot API and Data Dragon, serving synthetic fixtures.
+
+Riot endpoints are served under /<routing>/..., so a RiotAPIClient pointed at
+base_url="http://127.0.0.1:<port>/{routing}" talks to it unchanged; Data Dragon is served under /ddragon.
+"""
+import asyncio
+import hashlib
+import io
+import random
+import time
+from collections import Counter
+from aiohttp import web
+from PIL import Image
+
+DDRAGON_VERSION = "15.1.1"
+CHAMPIONS = ["Ahri", "Lux", "Jinx", "Thresh", "LeeSin", "Yasuo", "Ezreal", "Leona", "Zed", "Garen"]
+PLATFORM = "EUW1"
+
+# Keys we don't aggregate, to give participants the 100+ key size of real match-v5 payloads.
+FILLER_KEYS = [f"stat{i}" for i in range(110)]
+
+class Fixtures:
+    """
+    Deterministic synthetic players and ranked histories. Players are grouped in duos that share
+    `shared_ratio` of their games, so match caches and lobby lookups see realistic overlap.
+    """
+    def __init__(self, players: int = 200, history: int = 300, shared_ratio: float = 0.6, seed: int = 1):
+        rng = random.Random(seed)
+        self.puuids = [f"puuid-{i:05d}" for i in range(players)]
+        self.riot_ids = {(f"Player{i}".lower(), "bench"): puuid for i, puuid in enumerate(self.puuids)}
+        self.history: dict[str, list[str]] = {}  # puuid -> match IDs, newest first
+        self.match_players: dict[str, list[str]] = {}
+        self.match_start: dict[str, int] = {}
+
+        now_ms = int(time.time() * 1000)
+        next_match = 1
+        for duo_start in range(0, players, 2):
+            duo = self.puuids[duo_start:duo_start + 2]
+            for puuid in duo:
+                self.history.setdefault(puuid, [])
+            for game in range(history):
+                match_id = f"{PLATFORM}_{next_match}"
+                next_match += 1
+                self.match_start[match_id] = now_ms - (history - game) * 40 * 60 * 1000 - rng.randint(0, 600_000)
+                together = len(duo) == 2 and rng.random() < shared_ratio
+                members = duo if together else [duo[game % len(duo)]]
+                self.match_players[match_id] = members
+                for puuid in members:
+                    self.history[puuid].append(match_id)
+        for puuid in self.history:
+            self.history[puuid].sort(key=lambda m: self.match_start[m], reverse=True)
+
+    def match(self, match_id: str) -> dict | None:
+        if match_id not in self.match_players:
+            return None
+        rng = random.Random(match_id)
+        players = self.match_players[match_id] + [f"filler-{match_id}-{i}" for i in range(10)]
+        participants = []
+        for i, puuid in enumerate(players[:10]):
+            participant = {key: rng.randint(0, 10_000) for key in FILLER_KEYS}
+            participant.update({
+                "puuid": puuid,
+                "championName": rng.choice(CHAMPIONS),
+                "win": i < 5,
+                "kills": rng.randint(0, 15),
+                "deaths": rng.randint(0, 12),
+                "assists": rng.randint(0, 20),
+                "totalMinionsKilled": rng.randint(20, 280),
+                "neutralMinionsKilled": rng.randint(0, 60),
+                "goldEarned": rng.randint(5_000, 18_000),
+                "totalDamageDealtToChampions": rng.randint(5_000, 50_000),
+                "timePlayed": rng.randint(900, 2_400),
+            })
+            participants.append(participant)
+        return {
+            "metadata": {"matchId": match_id, "participants": [p["puuid"] for p in participants]},
+            "info": {"gameStartTimestamp": self.match_start[match_id], "queueId": 420, "participants": participants},
+        }
+
+def _encode(size: tuple[int, int], seed: str, fmt: str) -> bytes:
+    rng = random.Random(seed)
+    image = Image.effect_noise(size, 64).convert("RGB")
+    image = Image.blend(image, Image.new("RGB", size, tuple(rng.randint(0, 255) for _ in range(3))), 0.6)
+    output = io.BytesIO()
+    image.save(output, format=fmt)
+    return output.getvalue()
+
+class MockRiotServer:
+    """
+    aiohttp application serving account-v1, summoner-v4, match-v5 and Data Dragon from Fixtures.
+    `latency` (+ up to `jitter`) seconds are added to each response, `app_limit` ("requests:seconds,...")
+    is enforced per routing value and reported in X-App-Rate-Limit headers, `error_rate` of
+    requests are answered with an injected 429 and `server_error_rate` with an injected 503.
+    """
+    def __init__(self, fixtures: Fixtures, latency: float = 0.05, jitter: float = 0.02,
+                 app_limit: str = "500:10,30000:600", method_limit: str = "2000:10", error_rate: float = 0.0,
+                 server_error_rate: float = 0.0, seed: int = 1):
+        self.fixtures = fixtures
+        self.latency = latency
+        self.jitter = jitter
+        self.app_limit = app_limit
+        self.method_limit = method_limit
+        self.error_rate = error_rate
+        self.server_error_rate = server_error_rate
+        self.server_errors = 0
+        self.requests = Counter()  # endpoint -> count
+        self.throttled = 0
+        self._rng = random.Random(seed)
+        self._windows: dict[tuple[str, int], tuple[float, int]] = {}  # (routing, seconds) -> (window start, count)
+        self._images: dict[str, bytes] = {}
+
+    def reset_counters(self):
+        self.requests.clear()
+        self.throttled = 0
+        self.server_errors = 0
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get("/ddragon/api/versions.json", self.versions)
+        app.router.add_get("/ddragon/cdn/{version}/data/en_US/championFull.json", self.champion_full)
+        app.router.add_get("/ddragon/cdn/{version}/data/en_US/champion/{champ}.json", self.champion)
+        app.router.add_get("/ddragon/cdn/img/champion/splash/{name}", self.splash)
+        app.router.add_get("/ddragon/cdn/{version}/img/profileicon/{name}", self.profile_icon)
+        app.router.add_get("/{routing}/riot/account/v1/accounts/by-riot-id/{name}/{tag}", self.account)
+        app.router.add_get("/{routing}/lol/summoner/v4/summoners/by-puuid/{puuid}", self.summoner)
+        app.router.add_get("/{routing}/lol/match/v5/matches/by-puuid/{puuid}/ids", self.match_ids)
+        app.router.add_get("/{routing}/lol/match/v5/matches/{match_id}", self.match)
+        return app
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> tuple[web.AppRunner, int]:
+        """Serve in the current event loop; returns the runner (for cleanup) and the bound port."""
+        runner = web.AppRunner(self.app(), access_log=None)
+        await runner.setup()
+        site = web.TCPSite(runner, host, port)
+        await site.start()
+        return runner, site._server.sockets[0].getsockname()[1]
+
+    # ----------------- Riot API -----------------
+    def _limit_headers(self, routing: str) -> tuple[dict[str, str], bool]:
+        """Count a request against the routing value's app windows; returns headers and whether it's over."""
+        now = time.monotonic()
+        counts, exceeded = [], False
+        for part in self.app_limit.split(","):
+            limit, seconds = map(int, part.split(":"))
+            start, count = self._windows.get((routing, seconds), (now, 0))
+            if now - start >= seconds:
+                start, count = now, 0
+            count += 1
+            self._windows[(routing, seconds)] = (start, count)
+            counts.append(f"{count}:{seconds}")
+            exceeded = exceeded or count > limit
+        headers = {
+            "X-App-Rate-Limit": self.app_limit,
+            "X-App-Rate-Limit-Count": ",".join(counts),
+            "X-Method-Rate-Limit": self.method_limit,
+            "X-Method-Rate-Limit-Count": "1:" + self.method_limit.split(",")[0].split(":")[1],
+        }
+        return headers, exceeded
+
+    async def _riot(self, request: web.Request, endpoint: str, body):
+        self.requests[endpoint] += 1
+        await asyncio.sleep(self.latency + self._rng.random() * self.jitter)
+        headers, exceeded = self._limit_headers(request.match_info["routing"])
+        if exceeded or self._rng.random() < self.error_rate:
+            self.throttled += 1
+            headers.update({"Retry-After": "1", "X-Rate-Limit-Type": "application" if exceeded else "service"})
+            return web.json_response({"status": {"status_code": 429}}, status=429, headers=headers)
+        if self._rng.random() < self.server_error_rate:
+            self.server_errors += 1
+            return web.json_response({"status": {"status_code": 503}}, status=503, headers=headers)
+        if body is None:
+            return web.json_response({"status": {"status_code": 404}}, status=404, headers=headers)
+        return web.json_response(body, headers=headers)
+
+    async def account(self, request: web.Request):
+        key = (request.match_info["name"].lower(), request.match_info["tag"].lower())
+        puuid = self.fixtures.riot_ids.get(key)
+        body = {"puuid": puuid, "gameName": request.match_info["name"], "tagLine": request.match_info["tag"]} if puuid else None
+        return await self._riot(request, "account-v1", body)
+
+    async def summoner(self, request: web.Request):
+        puuid = request.match_info["puuid"]
+        digest = int(hashlib.md5(puuid.encode()).hexdigest(), 16)
+        body = {"puuid": puuid, "profileIconId": digest % 30, "summonerLevel": 30 + digest % 500} if puuid in self.fixtures.history else None
+        return await self._riot(request, "summoner-v4", body)
+
+    async def match_ids(self, request: web.Request):
+        history = self.fixtures.history.get(request.match_info["puuid"], [])
+        start_time = request.query.get("startTime")
+        if start_time is not None:
+            history = [m for m in history if self.fixtures.match_start[m] // 1000 >= int(start_time)]
+        start = int(request.query.get("start", 0))
+        count = int(request.query.get("count", 20))
+        return await self._riot(request, "match-v5.ids", history[start:start + count])
+
+    async def match(self, request: web.Request):
+        return await self._riot(request, "match-v5.match", self.fixtures.match(request.match_info["match_id"]))
+
+    # ----------------- Data Dragon -----------------
+    async def _ddragon(self, endpoint: str):
+        self.requests[endpoint] += 1
+        await asyncio.sleep(self.latency + self._rng.random() * self.jitter)
+
+    def _image(self, key: str, size: tuple[int, int], fmt: str) -> bytes:
+        if key not in self._images:
+            self._images[key] = _encode(size, key, fmt)
+        return self._images[key]
+
+    async def versions(self, request: web.Request):
+        await self._ddragon("ddragon.versions")
+        return web.json_response([DDRAGON_VERSION, "15.0.1"])
+
+    async def champion_full(self, request: web.Request):
+        await self._ddragon("ddragon.champion_full")
+        return web.json_response({"data": {c: {"id": c, "skins": [{"num": n} for n in range(3)]} for c in CHAMPIONS}})
+
+    async def champion(self, request: web.Request):
+        await self._ddragon("ddragon.champion")
+        champ = request.match_info["champ"]
+        if champ not in CHAMPIONS:
+            return web.Response(status=404, text="Not found")
+        return web.json_response({"data": {champ: {"id": champ, "skins": [{"num": n} for n in range(3)]}}})
+
+    async def splash(self, request: web.Request):
+        await self._ddragon("ddragon.splash")
+        name = request.match_info["name"]
+        return web.Response(body=self._image(name, (1215, 717), "JPEG"), content_type="image/jpeg")
+
+    async def profile_icon(self, request: web.Request):
+        await self._ddragon("ddragon.profile_icon")
+        name = request.match_info["name"]
+        return web.Response(body=self._image(name, (300, 300), "PNG"), content_type="image/png")
@@ -0,0 +1,139 @@
+"""
+Offline load benchmark for the stats and rendering pipeline.
+
+Starts MockRiotServer in-process, then has N simulated users run lookups (calculate_stats followed
+by generate_summary_image) against it and reports latency percentiles, Riot/ddragon requests per
+lookup, throughput and peak memory. The mock shares the event loop with the client, so compare
+runs made with the same options rather than reading absolute numbers as production latency.
+
+    python -m benchmarks.run_benchmark --users 20 --lookups 5 --match-count 25
+"""
+import argparse
+import asyncio
+import json
+import random
+import resource
+import statistics
+import tempfile
+import time
+import tracemalloc
+import image_generator
+from asset_cache import AssetCache
+from match_cache import MatchCache
+from render_pool import RenderExecutor
+from riot_api import RiotAPIClient
+from benchmarks.mock_riot_server import Fixtures, MockRiotServer
+
+def percentile(values: list[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+def use_mock_ddragon(url: str, cache_dir: str):
+    """Point image_generator at the mock Data Dragon with an empty asset cache."""
+    image_generator.DDRAGON_URL = url
+    image_generator.asset_cache = AssetCache(cache_dir)
+    image_generator._version_cache.discard("latest")
+
+async def simulated_user(user: int, args, client: RiotAPIClient, executor, fixtures: Fixtures, latencies: list, failures: list):
+    rng = random.Random(user)
+    # Skewed popularity: a few players are looked up far more often than the rest
+    popular = max(1, len(fixtures.puuids) // 10)
+    for _ in range(args.lookups):
+        player = rng.randrange(popular) if rng.random() < args.hot_ratio else rng.randrange(len(fixtures.puuids))
+        start = time.perf_counter()
+        try:
+            prefetcher = image_generator.AssetPrefetcher(await client.get_session()) if args.render else None
+            stats = await client.calculate_stats(f"Player{player}", "bench", "euw", args.match_count, prefetch=prefetcher)
+            if stats and args.render:
+                await image_generator.generate_summary_image(prefetcher.session, stats, executor, prefetched=prefetcher)
+            if not stats:
+                failures.append(player)
+        except Exception as e:
+            failures.append(f"{player}: {e}")
+        latencies.append(time.perf_counter() - start)
+
+async def run(args) -> dict:
+    fixtures = Fixtures(players=args.players, history=args.history)
+    server = MockRiotServer(fixtures, latency=args.latency_ms / 1000, jitter=args.jitter_ms / 1000,
+                            app_limit=args.app_limit, error_rate=args.error_rate, server_error_rate=args.server_error_rate)
+    runner, port = await server.start()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        use_mock_ddragon(f"http://127.0.0.1:{port}/ddragon", f"{tmp}/ddragon")
+        match_cache = MatchCache(f"{tmp}/matches.sqlite3") if args.match_cache else None
+        client = RiotAPIClient("benchmark-key", match_cache=match_cache, base_url=f"http://127.0.0.1:{port}/{{routing}}")
+        executor = RenderExecutor(workers=args.workers) if args.render else None
+
+        latencies, failures = [], []
+        if args.trace_memory:
+            tracemalloc.start()
+        start = time.perf_counter()
+        await asyncio.gather(*(
+            simulated_user(user, args, client, executor, fixtures, latencies, failures) for user in range(args.users)
+        ))
+        elapsed = time.perf_counter() - start
+        peak_traced = tracemalloc.get_traced_memory()[1] if args.trace_memory else 0
+        tracemalloc.stop()
+
+        await client.close()
+        if executor is not None:
+            executor.shutdown()
+        if match_cache is not None:
+            match_cache.close()
+    await runner.cleanup()
+
+    lookups = len(latencies)
+    riot_requests = sum(n for endpoint, n in server.requests.items() if not endpoint.startswith("ddragon"))
+    ddragon_requests = sum(n for endpoint, n in server.requests.items() if endpoint.startswith("ddragon"))
+    return {
+        "lookups": lookups,
+        "failures": len(failures),
+        "elapsed_s": round(elapsed, 2),
+        "throughput_per_s": round(lookups / elapsed, 2) if elapsed else 0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 1) if latencies else 0,
+        "riot_requests_per_lookup": round(riot_requests / lookups, 2) if lookups else 0,
+        "ddragon_requests_per_lookup": round(ddragon_requests / lookups, 2) if lookups else 0,
+        "throttled_429": server.throttled,
+        "server_errors_5xx": server.server_errors,
+        "requests_by_endpoint": dict(server.requests),
+        "peak_traced_mb": round(peak_traced / 1024 / 1024, 1) if args.trace_memory else None,
+        "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),  # KB on Linux
+    }
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark calculate_stats + generate_summary_image against a local mock Riot API.")
+    parser.add_argument("--users", type=int, default=10, help="concurrent simulated users")
+    parser.add_argument("--lookups", type=int, default=5, help="lookups per user")
+    parser.add_argument("--match-count", type=int, default=25, help="matches analysed per lookup")
+    parser.add_argument("--players", type=int, default=200, help="synthetic players in the fixtures")
+    parser.add_argument("--history", type=int, default=300, help="ranked games per duo in the fixtures")
+    parser.add_argument("--hot-ratio", type=float, default=0.5, help="share of lookups hitting the 10%% most popular players")
+    parser.add_argument("--latency-ms", type=float, default=50, help="base latency of every mock response")
+    parser.add_argument("--jitter-ms", type=float, default=20, help="random extra latency per response")
+    parser.add_argument("--app-limit", default="500:10,30000:600", help="X-App-Rate-Limit enforced by the mock")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of Riot requests answered with an injected 429")
+    parser.add_argument("--server-error-rate", type=float, default=0.0, help="share of Riot requests answered with an injected 503")
+    parser.add_argument("--workers", type=int, default=2, help="render worker processes (0 renders in a thread)")
+    parser.add_argument("--no-render", dest="render", action="store_false", help="only run calculate_stats")
+    parser.add_argument("--no-match-cache", dest="match_cache", action="store_false", help="disable the on-disk match cache")
+    parser.add_argument("--trace-memory", action="store_true", help="track peak Python allocations with tracemalloc (much slower)")
+    parser.add_argument("--json", dest="json_path", help="also write the report to this file")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    report = asyncio.run(run(args))
+    for key, value in report.items():
+        print(f"{key:>28}: {value}")
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,22 @@
+import asyncio
 import discord
+import hashlib
+import io
+import json
 import os
 import logging
+import time
 from discord.ext import commands
 from dotenv import load_dotenv
-from riot_api import RiotAPIClient
-from image_generator import generate_summary_image
+from riot_api import RiotAPIClient, parse_riot_ids
+from rate_limiter import RateLimiter
+from shared_rate_limiter import SharedRateLimiter
+from match_cache import MatchCache
+from single_flight import SingleFlight
+from job_queue import JobQueue, QueueFull
+from metrics import metrics, start_metrics_server
+from watchlist import Watchlist
+from stats_client import StatsServiceClient
 from config.bot_constants import *
 
 # ----------------- Logging -----------------
@@ -19,8 +31,13 @@ logger = logging.getLogger(__name__)
 load_dotenv()
 TOKEN = os.getenv("DISCORD_TOKEN")
 RIOT_API_KEY = os.getenv("RIOT_API_KEY")
+# Optional: run one shard per process, e.g. SHARD_ID=0..3 with SHARD_COUNT=4
+SHARD_ID = int(os.getenv("SHARD_ID")) if os.getenv("SHARD_ID") else None
+SHARD_COUNT = int(os.getenv("SHARD_COUNT")) if os.getenv("SHARD_COUNT") else None
+# Optional: fetch cards from a stats service (stats_service.py) instead of looking players up in this process
+STATS_SERVICE_URL = os.getenv("STATS_SERVICE_URL")
 
-if not RIOT_API_KEY or not TOKEN:
+if not (RIOT_API_KEY or STATS_SERVICE_URL) or not TOKEN:
     logger.critical("API/DISCORD TOKEN not found. Please set it in your .env file.")
     raise ValueError("Missing API/DISCORD token.")
 
@@ -29,16 +46,140 @@ intents = discord.Intents.default()
 intents.message_content = True
 
 # ----------------- Riot API -----------------
-riot_api_client = RiotAPIClient(RIOT_API_KEY)
+if STATS_SERVICE_URL:
+    # Thin client: the service does the lookups, keeps the caches and the watchlist
+    stats_service = StatsServiceClient(STATS_SERVICE_URL, os.getenv("STATS_SERVICE_TOKEN"))
+    match_cache = rate_limiter = riot_api_client = watchlist = None
+else:
+    stats_service = None
+    # The match cache, asset cache and, with several shard processes, the rate-limit budget are shared by every process on the machine
+    match_cache = MatchCache()
+    rate_limiter = SharedRateLimiter() if SHARED_RATE_LIMIT or (SHARD_COUNT or 1) > 1 else RateLimiter()
+    riot_api_client = RiotAPIClient(RIOT_API_KEY, match_cache=match_cache, rate_limiter=rate_limiter)
+    watchlist = Watchlist(riot_api_client)  # regulars refreshed in the background with spare rate-limit budget
+
+# ----------------- Rendering -----------------
+# Pillow, the card templates and the asset/card caches are imported on first use or by the warm-up, not at startup
+imaging = None          # the image_generator module, once loaded
+render_executor = None  # render_pool.RenderExecutor, created along with it
+
+def load_imaging():
+    """Import the image subsystem if it isn't loaded yet; returns the image_generator module."""
+    global imaging, render_executor
+    if imaging is None:
+        import image_generator
+        from render_pool import RenderExecutor
+        render_executor = RenderExecutor()
+        imaging = image_generator
+        metrics.register_collector(lambda: {f"asset_cache_{k}": v for k, v in imaging.asset_cache.stats().items()})
+        metrics.register_collector(lambda: {f"card_cache_{k}": v for k, v in imaging.card_cache.stats().items()})
+        metrics.register_collector(lambda: {f"render_{k}": v for k, v in render_executor.stats().items()})
+    return imaging
+
+card_flight = SingleFlight("card")  # identical concurrent !lolstats calls share one lookup and render
+lookup_queue = JobQueue("lookup")   # bounds concurrent lookups across all users, cheapest first
+
+def coalescing_stats():
+    flights = riot_api_client.coalescing_stats() if riot_api_client is not None else {}
+    return flights | {card_flight.name: card_flight.stats()}
+
+# ----------------- Metrics -----------------
+if stats_service is None:
+    metrics.register_collector(lambda: {f"match_cache_{k}": v for k, v in match_cache.stats().items()})
+    metrics.register_collector(lambda: {
+        "circuit_open": {routing: int(state != "closed") for routing, state in riot_api_client.circuit_states().items()}
+    })
+    metrics.register_collector(lambda: {f"watchlist_{k}": v for k, v in watchlist.stats().items()})
+    metrics.register_collector(lambda: {f"lookup_queue_{k}": v for k, v in lookup_queue.stats().items()})
+    metrics.register_collector(lambda: {
+        f"{name}_cache_{k}": v for name, cache in riot_api_client.lookup_cache_stats().items() for k, v in cache.items()
+    })
+metrics.register_collector(lambda: {f"coalesced_{name}": flight["coalesced"] for name, flight in coalescing_stats().items()})
 
 # ----------------- Custom Bot Class -----------------
 class MyBot(commands.Bot):
+    async def setup_hook(self):
+        # Runs once per process, unlike on_ready, which fires again after every gateway reconnect
+        self.sync_task = asyncio.create_task(self.sync_commands())
+        if stats_service is None:
+            await riot_api_client.start()
+            self.warm_up_task = asyncio.create_task(self.warm_up())
+        if METRICS_PORT:
+            # One port per shard process: METRICS_PORT, METRICS_PORT + 1, ...
+            self.metrics_runner = await start_metrics_server(METRICS_HOST, METRICS_PORT + (SHARD_ID or 0))
+        if WATCHLIST_ENABLED and not SHARD_ID and stats_service is None:  # only one process refreshes the watchlist
+            self.watchlist_task = asyncio.create_task(watchlist.run())
+
+    def command_tree_hash(self):
+        """Fingerprint of the slash commands as Discord would receive them."""
+        payload = [command.to_dict(self.tree) for command in self.tree.get_commands()]
+        data = json.dumps([self.application_id, payload], sort_keys=True, default=str)
+        return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+    async def sync_commands(self):
+        """Sync the slash commands only if they changed since the last sync (COMMAND_TREE_HASH_PATH)."""
+        tree_hash = self.command_tree_hash()
+        try:
+            with open(COMMAND_TREE_HASH_PATH, encoding="utf-8") as f:
+                if f.read().strip() == tree_hash:
+                    logger.info("Slash commands unchanged, skipping sync")
+                    return
+        except OSError:
+            pass
+        try:
+            await self.tree.sync()
+        except discord.HTTPException as e:
+            logger.warning(f"Slash command sync failed: {e}")
+            return
+        os.makedirs(os.path.dirname(COMMAND_TREE_HASH_PATH) or ".", exist_ok=True)
+        with open(COMMAND_TREE_HASH_PATH, "w", encoding="utf-8") as f:
+            f.write(tree_hash)
+        logger.info("Synced slash commands")
+
+    async def warm_up(self):
+        """
+        Get the first lookup's one-time costs out of the way while commands are already being served:
+        import the image subsystem, start the render workers (fonts, card template), fetch the
+        Data Dragon version and, with WARM_UP_ASSETS, every champion's skin list, and read the match cache index.
+        """
+        start = time.perf_counter()
+        images = load_imaging()
+        session = await riot_api_client.get_session()
+        steps = {
+            "render workers": render_executor.warm_up(),
+            "ddragon": images.warm_up_assets(session) if WARM_UP_ASSETS else images.get_latest_version(session),
+            "match cache": asyncio.to_thread(match_cache.warm_up),
+        }
+        results = await asyncio.gather(*steps.values(), return_exceptions=True)
+        for step, result in zip(steps, results):
+            if isinstance(result, Exception):
+                logger.warning(f"Warm-up of {step} failed: {result}")
+        logger.info(f"Warm-up finished in {time.perf_counter() - start:.2f} s")
+
     async def close(self):
-        logger.info("Shutting down Riot API session...")
-        await riot_api_client.close()
+        if getattr(self, "watchlist_task", None):
+            self.watchlist_task.cancel()
+        if getattr(self, "warm_up_task", None):
+            self.warm_up_task.cancel()
+        if stats_service is not None:
+            await stats_service.close()
+        else:
+            logger.info("Shutting down Riot API session...")
+            await riot_api_client.close()
+            logger.info(f"Match cache stats: {match_cache.stats()}, lookup caches: {riot_api_client.lookup_cache_stats()}")
+            match_cache.close()
+            rate_limiter.close()
+            watchlist.close()
+        if imaging is not None:
+            from card_encoder import encode_stats
+            logger.info(f"Render stats: {render_executor.stats()}, encode stats: {encode_stats.stats()}, card cache: {imaging.card_cache.stats()}")
+            render_executor.shutdown()
+        logger.info(f"Coalescing stats: {coalescing_stats()}")
+        if getattr(self, "metrics_runner", None):
+            await self.metrics_runner.cleanup()
         await super().close()
 
-bot = MyBot(command_prefix="!", intents=intents)
+bot = MyBot(command_prefix="!", intents=intents, shard_id=SHARD_ID, shard_count=SHARD_COUNT)
 
 # ----------------- Helper Functions -----------------
 def validate_match_count(count):
@@ -49,11 +190,68 @@ def validate_region(region):
     if region.lower() not in VALID_REGIONS:
         raise ValueError(f"Invalid region. Must be one of: {', '.join(VALID_REGIONS)}")
 
+def throttled_editor(message, render):
+    """Return a callback(*args) that edits `message` to render(*args), at most every PROGRESS_EDIT_INTERVAL seconds."""
+    last_edit = 0.0
+
+    async def edit(*args):
+        nonlocal last_edit
+        now = time.monotonic()
+        if now - last_edit < PROGRESS_EDIT_INTERVAL:
+            return
+        last_edit = now
+        try:
+            await message.edit(content=render(*args))
+        except discord.HTTPException:
+            pass  # progress is best effort
+
+    return edit
+
+def progress_editor(message):
+    """Return a progress(done, total) callback that shows match download progress in `message`."""
+    return throttled_editor(message, lambda done, total: f"🔍 Fetching matches... {done}/{total}")
+
+def queue_editor(message):
+    """Return an on_position(position, eta) callback that shows the lookup's place in the queue in `message`."""
+    return throttled_editor(message, lambda position, eta: f"⏳ Queued: #{position} in line, about {eta:.0f} s to go...")
+
+def job_timeout(ctx):
+    """Seconds a lookup may take: until shortly before a slash command's interaction expires, else LOOKUP_JOB_TIMEOUT."""
+    if ctx.interaction is None:
+        return LOOKUP_JOB_TIMEOUT
+    age = (discord.utils.utcnow() - ctx.interaction.created_at).total_seconds()
+    return max(0.0, INTERACTION_LIFETIME - age)
+
+async def queue_full_message(ctx):
+    """Tell the user the lookup or render queue is full (render_pool.RenderQueueFull is a QueueFull too)."""
+    stats = lookup_queue.stats()
+    await ctx.send(f"🚦 The bot is busy ({stats['waiting']} lookups queued). Please try again in a minute.")
+
+async def build_summary_card(summoner_name, tag_line, region, match_count, progress=None):
+    """Fetch stats and render the card; returns (image bytes, file name), or Nones if no stats were found."""
+    # Card assets start downloading as soon as the lookup knows the icon ID and likely champion
+    images = load_imaging()
+    prefetcher = images.AssetPrefetcher(await riot_api_client.get_session())
+    stats = await riot_api_client.calculate_stats(summoner_name, tag_line, region, match_count, progress, prefetcher)
+    if not stats:
+        return None, None
+    await watchlist.record_lookup(stats["puuid"], region, f"{summoner_name}#{tag_line}")
+    file_obj, filename = await images.generate_summary_image(prefetcher.session, stats, render_executor, prefetched=prefetcher)
+    return file_obj.getvalue(), filename
+
+async def build_lobby_card(riot_ids, region, progress=None):
+    """Fetch every player's stats and render the lobby card; returns (Riot IDs without stats, image, file name)."""
+    results = await riot_api_client.calculate_lobby_stats(riot_ids, region, LOBBY_MATCH_COUNT, progress)
+    missing = [f"{name}#{tag}" for (name, tag), stats in zip(riot_ids, results) if not stats]
+    found = [stats for stats in results if stats]
+    if not found:
+        return missing, None, None
+    file_obj, filename = await load_imaging().generate_lobby_image(await riot_api_client.get_session(), found, render_executor)
+    return missing, file_obj, filename
+
 # ----------------- Events -----------------
 @bot.event
 async def on_ready():
-    await riot_api_client.start()  # Start Riot API session
-    await bot.tree.sync()          # Sync hybrid/slash commands
     logger.info(f"Logged in as {bot.user}")
 
 @bot.event
@@ -68,6 +266,8 @@ async def on_command_error(ctx, error):
         original = getattr(error, "original", error)
         logger.exception(f"CommandInvokeError: {original}")
         await ctx.send("⚠️ Something went wrong while fetching your stats. Please try again later.")
+    elif isinstance(error, commands.NotOwner):
+        await ctx.send("⛔ This command is restricted to bot admins.")
     elif isinstance(error, commands.CommandNotFound):
         return  # ignore silently
     else:
@@ -87,26 +287,156 @@ async def lolstats(ctx, summoner_name: str, tag_line: str, region: str, match_co
         await ctx.send(f"{ve}")
         return
 
-    await ctx.send("🔍 Fetching summoner data...")
+    status_message = await ctx.send("🔍 Fetching summoner data...")
 
     if tag_line.startswith("#"):
         tag_line = tag_line[1:].strip()
 
+    key = (summoner_name.lower(), tag_line.lower(), region.lower(), match_count)
+    if stats_service is not None:
+        # The service queues and renders; identical requests still share one HTTP call
+        lookup = card_flight.do(key, stats_service.summary_card, summoner_name, tag_line, region, match_count)
+    else:
+        # Identical requests share one queued job; it is cancelled once every requester gave up
+        cost = riot_api_client.estimated_cost(summoner_name, tag_line, region, match_count)
+        lookup = card_flight.do(
+            key, lookup_queue.submit, cost, build_summary_card,
+            summoner_name, tag_line, region, match_count, progress_editor(status_message),
+            on_position=queue_editor(status_message),
+        )
     try:
         async with ctx.typing():
-            stats = await riot_api_client.calculate_stats(summoner_name, tag_line, region, match_count)
+            with metrics.span("lookup_and_render"):
+                card, filename = await asyncio.wait_for(lookup, timeout=job_timeout(ctx))
+    except QueueFull:
+        await queue_full_message(ctx)
+        return
+    except asyncio.TimeoutError:
+        logger.warning(f"Lookup of {summoner_name}#{tag_line} in {region} timed out and was cancelled")
+        if ctx.interaction is None:
+            await ctx.send("⌛ This lookup took too long and was cancelled. Please try again later.")
+        return
     except Exception as e:
         logger.exception(f"Error fetching stats: {e}")
         await ctx.send("An unexpected error occurred. Please try again later.")
         return
 
-    if not stats:
+    if card is None:
         await ctx.send("Failed to fetch stats. Please check the summoner-name, tag-line, and region.")
         return
 
-    file_obj = generate_summary_image(stats)
-    file_obj.seek(0)
-    await ctx.send(file=discord.File(file_obj, "summary.png"))
+    with metrics.span("discord_upload"):
+        await ctx.send(file=discord.File(io.BytesIO(card), filename))
+
+@bot.hybrid_command(name="lobbystats")
+@commands.cooldown(1, LOBBYSTATS_COOLDOWN, commands.BucketType.user)
+async def lobbystats(ctx, region: str, *, players: str):
+    """Fetches stats for up to 10 Riot IDs at once (comma-separated) and shows them on one card."""
+    logger.info(f"{ctx.author} invoked lobbystats in {region}: {players}")
+    try:
+        validate_region(region)
+        riot_ids = parse_riot_ids(players, LOBBY_MAX_PLAYERS)
+    except ValueError as ve:
+        await ctx.send(f"{ve}")
+        return
+
+    status_message = await ctx.send(f"🔍 Fetching {len(riot_ids)} players...")
+    if stats_service is not None:
+        lookup = stats_service.lobby_card(riot_ids, region)
+    else:
+        cost = sum(riot_api_client.estimated_cost(name, tag, region, LOBBY_MATCH_COUNT) for name, tag in riot_ids)
+        lookup = lookup_queue.submit(
+            cost, build_lobby_card, riot_ids, region, progress_editor(status_message),
+            on_position=queue_editor(status_message),
+        )
+    try:
+        async with ctx.typing():
+            with metrics.span("lobby_lookup_and_render"):
+                missing, file_obj, filename = await asyncio.wait_for(lookup, timeout=job_timeout(ctx))
+    except QueueFull:
+        await queue_full_message(ctx)
+        return
+    except asyncio.TimeoutError:
+        logger.warning(f"Lobby lookup in {region} timed out and was cancelled")
+        if ctx.interaction is None:
+            await ctx.send("⌛ This lookup took too long and was cancelled. Please try again later.")
+        return
+    except Exception as e:
+        logger.exception(f"Error fetching lobby stats: {e}")
+        await ctx.send("An unexpected error occurred. Please try again later.")
+        return
+
+    if file_obj is None:
+        await ctx.send("Failed to fetch stats for every player. Please check the Riot IDs and region.")
+        return
+    note = f"Could not find stats for: {', '.join(missing)}" if missing else None
+    with metrics.span("discord_upload"):
+        await ctx.send(note, file=discord.File(file_obj, filename))
+
+@bot.hybrid_command(name="perf")
+@commands.is_owner()
+async def perf(ctx):
+    """Shows per-stage latency percentiles, cache and rate-limit counters (bot admins only)."""
+    lines = metrics.summary() or ["No measurements yet."]
+    text = "\n".join(lines)
+    if len(text) > PERF_OUTPUT_LIMIT:
+        text = text[:PERF_OUTPUT_LIMIT] + "\n..."
+    await ctx.send(f"```\n{text}\n```")
+
+@bot.hybrid_group(name="watch", invoke_without_command=True)
+@commands.is_owner()
+async def watch(ctx):
+    """Lists the players kept warm by the background watchlist (bot admins only)."""
+    if stats_service is not None:
+        await ctx.send("The watchlist is kept by the stats service; see its watchlist_* metrics.")
+        return
+    await watchlist.sync()
+    entries = sorted(watchlist.entries.values(), key=lambda e: (e.source, e.label.lower()))
+    if not entries:
+        await ctx.send("The watchlist is empty. Add players with `!watch add <summoner-name> <tag-line> <region>`.")
+        return
+    lines = [f"{e.label} ({e.region.upper()}, {e.source})" for e in entries]
+    text = "\n".join(lines)
+    if len(text) > PERF_OUTPUT_LIMIT:
+        text = text[:PERF_OUTPUT_LIMIT] + "\n..."
+    await ctx.send(f"```\n{text}\n```")
+
+@watch.command(name="add")
+@commands.is_owner()
+async def watch_add(ctx, summoner_name: str, tag_line: str, region: str):
+    """Adds a player to the watchlist (bot admins only)."""
+    if stats_service is not None:
+        await ctx.send("The watchlist is kept by the stats service; it adds frequently looked-up players on its own.")
+        return
+    try:
+        validate_region(region)
+        account = await riot_api_client.get_summoner_info(summoner_name, tag_line.lstrip("#"), region)
+    except Exception as e:
+        await ctx.send(f"Could not find {summoner_name}#{tag_line}: {e}")
+        return
+    label = f"{account.get('gameName', summoner_name)}#{account.get('tagLine', tag_line.lstrip('#'))}"
+    if await watchlist.add(account["puuid"], region.lower(), label):
+        await ctx.send(f"👀 Now watching {label}.")
+    else:
+        await ctx.send(f"{label} is already on the watchlist.")
+
+@watch.command(name="remove")
+@commands.is_owner()
+async def watch_remove(ctx, summoner_name: str, tag_line: str, region: str):
+    """Removes a player from the watchlist (bot admins only)."""
+    if stats_service is not None:
+        await ctx.send("The watchlist is kept by the stats service; it adds frequently looked-up players on its own.")
+        return
+    try:
+        validate_region(region)
+        account = await riot_api_client.get_summoner_info(summoner_name, tag_line.lstrip("#"), region)
+    except Exception as e:
+        await ctx.send(f"Could not find {summoner_name}#{tag_line}: {e}")
+        return
+    if await watchlist.remove(account["puuid"]):
+        await ctx.send(f"Stopped watching {summoner_name}#{tag_line.lstrip('#')}.")
+    else:
+        await ctx.send(f"{summoner_name}#{tag_line.lstrip('#')} is not on the watchlist.")
 
 @bot.hybrid_command(name="help_lol")
 async def help_lol(ctx):
@@ -114,4 +444,5 @@ async def help_lol(ctx):
     await ctx.send(HELP_OUTPUT)
 
 # ----------------- Run Bot -----------------
-bot.run(TOKEN)
\ No newline at end of file
+if __name__ == "__main__":  # render worker processes may re-import this module
+    bot.run(TOKEN)
\ No newline at end of file
@@ -0,0 +1,70 @@
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from config.image_constants import CARD_CACHE_MEMORY_BUDGET, CARD_CACHE_TTL
+
+def card_key(stats: dict, ddragon_version: str, champion: str | None, skin_num: int | None, output_format: str) -> str:
+    """Fingerprint of everything that goes into a rendered card."""
+    payload = json.dumps([stats, ddragon_version, champion, skin_num, output_format], sort_keys=True, default=str)
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=16).hexdigest()
+
+class CardCache:
+    """
+    Encoded summary cards keyed by card_key, kept for `ttl` seconds in an LRU bounded by
+    `memory_budget` bytes, so an unchanged card is served without fetching assets or rendering.
+    """
+    def __init__(self, memory_budget: int = CARD_CACHE_MEMORY_BUDGET, ttl: float = CARD_CACHE_TTL):
+        self.memory_budget = memory_budget
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._cards: OrderedDict[str, tuple[float, bytes, str]] = OrderedDict()  # key -> (expires at, data, extension)
+        self._players: dict[str, str] = {}  # player -> key of their latest cached card
+        self._memory_used = 0
+
+    def get(self, key: str) -> tuple[bytes, str] | None:
+        """Return (data, extension) of a cached card, or None if missing or expired."""
+        entry = self._cards.get(key)
+        if entry is None or entry[0] <= time.monotonic():
+            if entry is not None:
+                self._drop(key)
+            self.misses += 1
+            return None
+        self._cards.move_to_end(key)
+        self.hits += 1
+        return entry[1], entry[2]
+
+    def has_player(self, player: str) -> bool:
+        """Whether a card of `player` is cached, i.e. their next card is likely a hit; doesn't count as a lookup."""
+        key = self._players.get(player)
+        entry = self._cards.get(key) if key is not None else None
+        return entry is not None and entry[0] > time.monotonic()
+
+    def put(self, key: str, data: bytes, extension: str, player: str | None = None):
+        if key in self._cards:
+            self._drop(key)
+        if len(data) > self.memory_budget:
+            return
+        self._cards[key] = (time.monotonic() + self.ttl, data, extension)
+        self._memory_used += len(data)
+        if player is not None:
+            self._players[player] = key
+        while self._memory_used > self.memory_budget:
+            self._drop(next(iter(self._cards)))
+
+    def _drop(self, key: str):
+        _, data, _ = self._cards.pop(key)
+        self._memory_used -= len(data)
+        if len(self._players) > len(self._cards):
+            self._players = {player: k for player, k in self._players.items() if k in self._cards}
+
+    def stats(self) -> dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "cards": len(self._cards),
+            "memory_used": self._memory_used,
+        }
@@ -0,0 +1,64 @@
+import io
+import time
+from PIL import Image
+from config.image_constants import *
+
+# Format name -> (Pillow format, file extension, save options)
+ENCODERS = {
+    "png": ("PNG", "png", {"compress_level": CARD_PNG_COMPRESS_LEVEL, "optimize": CARD_PNG_OPTIMIZE}),
+    "webp": ("WEBP", "webp", {"quality": CARD_WEBP_QUALITY, "method": CARD_WEBP_METHOD}),
+    "jpeg": ("JPEG", "jpg", {"quality": CARD_JPEG_QUALITY, "optimize": True, "progressive": True}),
+}
+
+def encode_image(image: Image.Image, fmt: str) -> tuple[bytes, float]:
+    """Encode `image` as `fmt` (a key of ENCODERS); returns the bytes and the seconds spent encoding."""
+    pil_format, _, options = ENCODERS[fmt]
+    if pil_format == "JPEG" and image.mode != "RGB":
+        image = image.convert("RGB")
+    start = time.perf_counter()
+    output = io.BytesIO()
+    image.save(output, format=pil_format, **options)
+    return output.getvalue(), time.perf_counter() - start
+
+def encode_card(image: Image.Image, fmt: str = CARD_OUTPUT_FORMAT, budget: int = CARD_BYTE_BUDGET,
+                candidates: tuple[str, ...] = CARD_AUTO_FORMATS) -> tuple[bytes, str, list[tuple[str, int, float]]]:
+    """
+    Encode a rendered card. With fmt="auto" every format in `candidates` is tried and the smallest
+    encoding under `budget` bytes wins (the smallest overall if none fits).
+    Returns (data, file extension, attempts) where attempts lists (format, bytes, seconds) per encode.
+    """
+    formats = candidates if fmt == "auto" else (fmt,)
+    attempts = []
+    best = None
+    for name in formats:
+        data, seconds = encode_image(image, name)
+        attempts.append((name, len(data), seconds))
+        fits = len(data) <= budget
+        if best is None or (fits, -len(data)) > (best[2], -len(best[0])):
+            best = (data, name, fits)
+    data, name, _ = best
+    return data, ENCODERS[name][1], attempts
+
+class EncodeStats:
+    """Per-format encode counters: how often, how long and how large."""
+    def __init__(self):
+        self._formats: dict[str, list[float]] = {}  # format -> [count, total seconds, total bytes]
+
+    def record(self, attempts: list[tuple[str, int, float]]):
+        for name, size, seconds in attempts:
+            totals = self._formats.setdefault(name, [0, 0.0, 0])
+            totals[0] += 1
+            totals[1] += seconds
+            totals[2] += size
+
+    def stats(self) -> dict[str, dict[str, float]]:
+        return {
+            name: {
+                "encodes": count,
+                "avg_ms": round(seconds / count * 1000, 2),
+                "avg_kb": round(size / count / 1024, 1),
+            }
+            for name, (count, seconds, size) in self._formats.items()
+        }
+
+encode_stats = EncodeStats()
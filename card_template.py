@@ -0,0 +1,126 @@
+from functools import lru_cache
+from PIL import Image, ImageDraw, ImageFont
+from config.image_constants import *
+
+@lru_cache(maxsize=None)
+def load_font(path: str, size: int) -> ImageFont.FreeTypeFont:
+    """Load a TrueType font once per (path, size) for the lifetime of the process."""
+    return ImageFont.truetype(path, size=size)
+
+@lru_cache(maxsize=TEXT_SIZE_CACHE_SIZE)
+def text_size(text: str, font_path: str, size: int) -> tuple[int, int]:
+    """Width and height of `text`, memoized since names, levels and labels repeat constantly."""
+    left, top, right, bottom = load_font(font_path, size).getbbox(text)
+    return right - left, bottom - top
+
+class CardTemplate:
+    """
+    Static parts of the summary card, built once per process: fonts, the semi-transparent
+    overlay layers, the fallback canvases and the text/shadow positions of the stats block.
+    Rendering a card then only composites the overlays onto the splash and draws the text.
+    """
+    def __init__(self, canvas_size: tuple[int, int] = CHAMPION_SPLASH_SIZE, stats_lines: int = STATS_LINE_COUNT):
+        self.canvas_size = canvas_size
+        self.stats_font = load_font(title_font, STATS_FONT_SIZE)
+        self.icon_font = load_font(title_font, ICON_FONT_SIZE)
+        self.lobby_font = load_font(title_font, LOBBY_FONT_SIZE)
+
+        # Stats block: overlay position and (shadow, foreground) coordinates of each line
+        self.stats_overlay_height = STATS_LINE_HEIGHT * stats_lines + STATS_FONT_SIZE
+        self.stats_overlay_pos = (STATS_PADDING_X - 20, STATS_PADDING_Y - 20)
+        self.stats_positions = []
+        for i in range(stats_lines):
+            y = STATS_PADDING_Y + i * STATS_LINE_HEIGHT
+            shadow = (STATS_PADDING_X + STATS_SHADOW_OFFSET, y + STATS_SHADOW_OFFSET)
+            self.stats_positions.append((shadow, (STATS_PADDING_X, y)))
+        self._overlays: dict[tuple[int, int], Image.Image] = {}
+
+        self.fallback_background = self.add_stats_overlay(Image.new("RGB", canvas_size, FALLBACK_BG_RGB))
+        self.fallback_icon = Image.new("RGB", PROFILE_ICON_SIZE, FALLBACK_ICON_RGB)
+
+    def overlay(self, size: tuple[int, int]) -> Image.Image:
+        """Semi-transparent overlay layer of the given size, built once and reused."""
+        if size not in self._overlays:
+            self._overlays[size] = Image.new("RGBA", size, STATS_RGBA)
+        return self._overlays[size]
+
+    def add_stats_overlay(self, bg: Image.Image) -> Image.Image:
+        overlay = self.overlay((bg.width - STATS_PADDING_X - STATS_FONT_SIZE, self.stats_overlay_height))
+        bg.paste(overlay, self.stats_overlay_pos, overlay)
+        return bg
+
+    def background(self, splash: Image.Image | None) -> Image.Image:
+        """Card canvas with the stats overlay applied; `splash` is drawn on in place."""
+        if splash is None:
+            return self.fallback_background.copy()
+        return self.add_stats_overlay(splash)
+
+    def draw_icon_panel(self, icon: Image.Image, stats: dict) -> Image.Image:
+        """Draw name, tag line and level over the bottom of the profile icon."""
+        draw = ImageDraw.Draw(icon, "RGBA")
+        padding = ICON_FONT_Y_PADDING
+        bottom_padding = 6  # extra space below the level
+
+        lines = [f"{stats['name']}", f"#{stats['tag_line']}", f"Level {stats['profile_summoner_level']}"]
+        heights = [text_size(text, title_font, ICON_FONT_SIZE)[1] for text in lines]
+
+        # Overlay height includes extra padding below level
+        box_height = sum(heights) + padding * 4 + bottom_padding
+        y_start = icon.height - box_height + padding
+        overlay = self.overlay((icon.width, box_height))
+        icon.paste(overlay, (0, icon.height - box_height), overlay)
+
+        y_offsets = [y_start, y_start + heights[0] + padding, y_start + heights[0] + heights[1] + padding * 2]
+        for text, y in zip(lines, y_offsets):
+            draw.text((padding + STATS_SHADOW_OFFSET, y + STATS_SHADOW_OFFSET), text, font=self.icon_font, fill="black")
+            draw.text((padding, y), text, font=self.icon_font, fill="white")
+        return icon
+
+    def draw_stats(self, bg: Image.Image, stats_text: list[str]):
+        """Draw each stats line with its shadow at the precomputed positions."""
+        draw = ImageDraw.Draw(bg, "RGBA")
+        for text, (shadow, foreground) in zip(stats_text, self.stats_positions):
+            draw.text(shadow, text, font=self.stats_font, fill="black")
+            draw.text(foreground, text, font=self.stats_font, fill="white")
+
+    def render(self, stats: dict, stats_text: list[str], splash: Image.Image | None, icon: Image.Image | None) -> Image.Image:
+        bg = self.background(splash)
+        icon = self.draw_icon_panel(icon or self.fallback_icon.copy(), stats)
+        bg.paste(icon, (0, 0))
+        self.draw_stats(bg, stats_text)
+        return bg
+
+    def render_lobby(self, players: list[tuple[dict, Image.Image | None, list[str]]]) -> Image.Image:
+        """
+        Grid of LOBBY_COLUMNS players per row: each cell is the player's icon panel
+        (see draw_icon_panel) with their stats lines below it. `players` holds (stats, icon, lines).
+        """
+        icon_w, icon_h = PROFILE_ICON_SIZE
+        cell_w = icon_w + LOBBY_CELL_PADDING
+        cell_h = icon_h + LOBBY_LINE_HEIGHT * LOBBY_LINE_COUNT + LOBBY_CELL_PADDING * 2
+        columns = min(LOBBY_COLUMNS, len(players)) or 1
+        rows = -(-len(players) // columns)
+        grid = Image.new("RGB", (cell_w * columns + LOBBY_CELL_PADDING, cell_h * rows + LOBBY_CELL_PADDING), FALLBACK_BG_RGB)
+        draw = ImageDraw.Draw(grid, "RGBA")
+
+        for i, (stats, icon, lines) in enumerate(players):
+            x = LOBBY_CELL_PADDING + (i % columns) * cell_w
+            y = LOBBY_CELL_PADDING + (i // columns) * cell_h
+            icon = icon.copy() if icon is not None else self.fallback_icon.copy()
+            if icon.size != PROFILE_ICON_SIZE:
+                icon = icon.resize(PROFILE_ICON_SIZE)
+            grid.paste(self.draw_icon_panel(icon, stats), (x, y))
+            for j, text in enumerate(lines[:LOBBY_LINE_COUNT]):
+                line_y = y + icon_h + LOBBY_CELL_PADDING // 2 + j * LOBBY_LINE_HEIGHT
+                draw.text((x + STATS_SHADOW_OFFSET, line_y + STATS_SHADOW_OFFSET), text, font=self.lobby_font, fill="black")
+                draw.text((x, line_y), text, font=self.lobby_font, fill="white")
+        return grid
+
+_template: CardTemplate | None = None
+
+def get_card_template() -> CardTemplate:
+    """Return this process's card template, building it on first use."""
+    global _template
+    if _template is None:
+        _template = CardTemplate()
+    return _template
@@ -0,0 +1,53 @@
+import logging
+import time
+from config.API_constants import CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_RESET_TIMEOUT
+from metrics import metrics
+
+class CircuitOpenError(Exception):
+    pass
+
+class CircuitBreaker:
+    """
+    Stops calling a host that keeps failing. After `failure_threshold` consecutive failures
+    (5xx responses, timeouts, connection errors) the circuit opens and requests fail immediately
+    for `reset_timeout` seconds; then a single trial request is let through (half-open), and its
+    outcome closes the circuit again or re-opens it.
+    """
+    def __init__(self, name: str, failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD, reset_timeout: float = CIRCUIT_RESET_TIMEOUT):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trial_started = 0.0  # when the half-open trial request was let through, 0 if none
+        self.logger = logging.getLogger(__name__)
+
+    def check(self):
+        """Raise CircuitOpenError unless a request to this host may start now."""
+        now = time.monotonic()
+        if self.state == "open":
+            if now - self.opened_at < self.reset_timeout:
+                raise CircuitOpenError(f"Circuit for {self.name} is open after {self.failures} failures")
+            self.state = "half_open"
+        if self.state == "half_open":
+            # One trial at a time; a trial that never reported back (e.g. cancelled) expires
+            if self.trial_started and now - self.trial_started < self.reset_timeout:
+                raise CircuitOpenError(f"Circuit for {self.name} is half-open, waiting for a trial request")
+            self.trial_started = now
+
+    def record_success(self):
+        if self.state != "closed":
+            self.logger.info(f"Circuit for {self.name} closed again")
+        self.state = "closed"
+        self.failures = 0
+        self.trial_started = 0.0
+
+    def record_failure(self):
+        self.failures += 1
+        self.trial_started = 0.0
+        if self.state == "half_open" or (self.state == "closed" and self.failures >= self.failure_threshold):
+            self.state = "open"
+            self.opened_at = time.monotonic()
+            metrics.inc("circuit_opened_total", host=self.name)
+            self.logger.warning(f"Circuit for {self.name} opened after {self.failures} failures, retrying in {self.reset_timeout} seconds")
@@ -1,9 +1,17 @@
+# Riot API host template; "{routing}" is a platform (euw1, na1, ...) or regional (europe, americas, ...) value.
+RIOT_API_URL = "https://{routing}.api.riotgames.com"
+
 RATE_LIMIT_EXCEEDED = 429
 BODY_JSON_RESPONSE = 200
 
 FETCHED_PARTICIPANT_MATCHES = 10
 
-SEMAPHORE_LIMIT = 2
+# Application rate limit assumed per routing value until the first response reports the real one
+# (development key limits, "<requests>:<seconds>" pairs as in the X-App-Rate-Limit header).
+DEFAULT_APP_RATE_LIMIT = "20:1,100:120"
+
+# How many times a request is retried after a 429 before giving up.
+RATE_LIMIT_MAX_RETRIES = 3
 
 DISCORD_RATE_LIMIT_TIMEOUT = 5
 
@@ -37,4 +45,73 @@ REGION_TO_REGIONAL = {
     "LAS": "americas",
     "RU": "europe",
     "TR": "europe",
-}
\ No newline at end of file
+}
+
+# On-disk cache of finished match-v5 payloads (match data never changes once a game is over).
+MATCH_CACHE_PATH = "cache/matches.sqlite3"
+MATCH_CACHE_MAX_ENTRIES = 50_000
+# A hit only rewrites a match's last access time once it is this many seconds old, so reads rarely write.
+MATCH_CACHE_TOUCH_INTERVAL = 60 * 60
+# The table size is checked (and the cache trimmed to MATCH_CACHE_MAX_ENTRIES) once per this many inserts.
+MATCH_CACHE_EVICT_EVERY = 500
+
+# Per-player running stats kept between lookups so repeat lookups only fetch new games.
+PLAYER_STATE_MAX_MATCHES = 1000
+PLAYER_STORE_MAX_PLAYERS = 5_000
+
+# Match history streaming: match-v5 returns at most 100 IDs per request, at most
+# MATCH_STREAM_WINDOW match details are in flight per lookup, and arriving records are
+# merged into the player's state MATCH_MERGE_BATCH at a time.
+MATCH_IDS_PAGE_SIZE = 100
+MATCH_STREAM_WINDOW = 32
+MATCH_MERGE_BATCH = 25
+
+# Lookup caches: Riot ID -> account (PUUID) rarely changes, PUUID -> summoner (icon, level) changes more often.
+ACCOUNT_CACHE_TTL = 24 * 60 * 60
+SUMMONER_CACHE_TTL = 10 * 60
+LOOKUP_CACHE_MAX_ENTRIES = 20_000
+
+# Background traffic (watchlist refreshes) leaves this share of every rate-limit window to live
+# lookups, and re-checks every BACKGROUND_POLL_INTERVAL seconds while live requests are queued.
+BACKGROUND_RESERVED_SHARE = 0.5
+BACKGROUND_POLL_INTERVAL = 0.5
+
+# Watchlist: players kept warm in the background. Players looked up WATCHLIST_PROMOTE_LOOKUPS times
+# within WATCHLIST_PROMOTE_WINDOW seconds are added automatically and dropped again after
+# WATCHLIST_AUTO_EXPIRY seconds without a lookup; players added by an admin stay until removed.
+# The list is shared by every bot process through WATCHLIST_PATH.
+WATCHLIST_PATH = "cache/watchlist.sqlite3"
+WATCHLIST_REFRESH_INTERVAL = 15 * 60
+WATCHLIST_TICK = 5
+WATCHLIST_REFRESHES_PER_TICK = 2
+WATCHLIST_MATCH_COUNT = 100
+WATCHLIST_PROMOTE_LOOKUPS = 3
+WATCHLIST_PROMOTE_WINDOW = 24 * 60 * 60
+WATCHLIST_AUTO_EXPIRY = 7 * 24 * 60 * 60
+WATCHLIST_MAX_AUTO = 300
+
+# Rate-limit ledger shared by every bot process on the machine (see shared_rate_limiter.py).
+RATE_LIMIT_LEDGER_PATH = "cache/ratelimit.sqlite3"
+RATE_LIMIT_LEDGER_BUSY_TIMEOUT = 5
+RATE_LIMIT_LEDGER_MAX_BLOCK = 60 * 60  # longer Retry-After blocks in the ledger are treated as stale
+RATE_LIMIT_LEDGER_RETRY = 0.25  # seconds a request waits before trying again when the ledger stays locked
+
+# HTTP transport shared by the Riot API and Data Dragon clients. Timeouts are in seconds and bound
+# how long one slow host can hold a coroutine; the connection pool is capped overall and per host.
+HTTP_CONNECT_TIMEOUT = 3
+HTTP_READ_TIMEOUT = 10
+HTTP_TOTAL_TIMEOUT = 20
+HTTP_POOL_LIMIT = 100
+HTTP_POOL_LIMIT_PER_HOST = 32
+DNS_CACHE_TTL = 300
+
+# 5xx responses and transport errors are retried with capped exponential backoff and full jitter:
+# a random delay of up to min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt) seconds.
+SERVER_ERROR_MAX_RETRIES = 3
+BACKOFF_BASE = 0.5
+BACKOFF_CAP = 8
+
+# Per routing host: after CIRCUIT_FAILURE_THRESHOLD consecutive failures, fail fast for
+# CIRCUIT_RESET_TIMEOUT seconds before letting a trial request through.
+CIRCUIT_FAILURE_THRESHOLD = 5
+CIRCUIT_RESET_TIMEOUT = 30
@@ -1,8 +1,11 @@
 # ----------------- Bot Constants -----------------
 
 # Maximum number of recent matches that can be fetched for a summoner.
-# Prevents overloading the Riot API and keeps response times reasonable.
-MAX_MATCH_COUNT = 100
+# Match history is paged and streamed, so this is bounded by lookup time rather than memory.
+MAX_MATCH_COUNT = 1000
+
+# Minimum seconds between edits of the "Fetching..." message while matches stream in.
+PROGRESS_EDIT_INTERVAL = 2
 
 # Default number of matches to fetch if the user does not specify a match count.
 DEFAULT_MATCH_COUNT = 25
@@ -11,12 +14,56 @@ DEFAULT_MATCH_COUNT = 25
 # Prevents spam and excessive API calls.
 LOLSTATS_COOLDOWN = 10
 
+# Lookup job queue: at most LOOKUP_WORKERS lookups run at once and LOOKUP_QUEUE_MAX_DEPTH wait;
+# further requests are turned away. Waiting lookups start cheapest first (estimated match details
+# to fetch), minus LOOKUP_QUEUE_AGING per second waited so cold scans are not starved.
+LOOKUP_WORKERS = 8
+LOOKUP_QUEUE_MAX_DEPTH = 50
+LOOKUP_QUEUE_AGING = 10
+
+# Slash command interactions can only be answered for 15 minutes, so queued work is cancelled
+# before then; prefix commands give up after LOOKUP_JOB_TIMEOUT seconds.
+INTERACTION_LIFETIME = 15 * 60 - 30
+LOOKUP_JOB_TIMEOUT = 5 * 60
+
+# !lobbystats: at most LOBBY_MAX_PLAYERS Riot IDs, LOBBY_MATCH_COUNT matches each, one cooldown per call.
+LOBBY_MAX_PLAYERS = 10
+LOBBY_MATCH_COUNT = 20
+LOBBYSTATS_COOLDOWN = 30
+
+# Preload every champion's skin list from Data Dragon at startup so card rendering
+# makes no champion JSON requests.
+WARM_UP_ASSETS = True
+
+# Hash of the last synced slash command tree; commands are only re-synced with Discord when it
+# changes. Delete the file to force a sync.
+COMMAND_TREE_HASH_PATH = "cache/command_tree.sha256"
+
+# Local Prometheus-style metrics endpoint (http://METRICS_HOST:METRICS_PORT/metrics).
+# Set METRICS_PORT to 0 to disable it.
+METRICS_HOST = "127.0.0.1"
+METRICS_PORT = 9108
+
+# Discord messages are capped at 2000 characters; leave room for the code block.
+PERF_OUTPUT_LIMIT = 1900
+
+# Share the Riot rate-limit budget with other bot processes on this machine through a SQLite
+# ledger (RATE_LIMIT_LEDGER_PATH). It costs two ledger transactions per request, so it is only
+# used when several processes share one API key: automatically with SHARD_COUNT > 1 (and for a
+# stats service with SERVICE_WORKERS > 1); set this to True for processes started some other way.
+SHARED_RATE_LIMIT = False
+
+# Refresh watchlisted players in the background (see watchlist.py)
+WATCHLIST_ENABLED = True
+
 # Help message displayed by the !help_lol command.
 # Explains available commands and their usage.
 HELP_OUTPUT = """
 Available commands:
 - Fetch League of Legends stats for a player: 
   `!lolstats <summoner_name> <tag_line> <region> (optional)<match_amount>`
+- Fetch stats for a whole team or lobby (up to 10 Riot IDs) on one card:
+  `!lobbystats <region> <name#tag>, <name#tag>, ...`
 - Show this help message: 
   `!help_lol`
 """
@@ -1,3 +1,26 @@
+# Data Dragon CDN serving champion data, splash art and profile icons.
+DDRAGON_URL = "https://ddragon.leagueoflegends.com"
+
+# Data Dragon asset cache: raw files on disk per ddragon version, decoded images in memory.
+ASSET_CACHE_DIR = "cache/ddragon"
+ASSET_MEMORY_BUDGET = 256 * 1024 * 1024  # bytes of decoded pixel data (~95 splash arts)
+
+# Card rendering runs in a pool of worker processes; at most RENDER_MAX_QUEUE renders
+# may be running or waiting at once (0 workers renders in a thread instead).
+RENDER_WORKERS = 2
+RENDER_MAX_QUEUE = 32
+
+# Card output encoding: "png", "webp", "jpeg", or "auto" to send the smallest of
+# CARD_AUTO_FORMATS that stays under CARD_BYTE_BUDGET bytes.
+CARD_OUTPUT_FORMAT = "auto"
+CARD_AUTO_FORMATS = ("webp", "jpeg")
+CARD_BYTE_BUDGET = 400 * 1024
+CARD_JPEG_QUALITY = 88
+CARD_WEBP_QUALITY = 85
+CARD_WEBP_METHOD = 4  # 0 (fast) - 6 (smallest)
+CARD_PNG_COMPRESS_LEVEL = 6
+CARD_PNG_OPTIMIZE = False
+
 # image generation font constants
 # These fonts are used for rendering text in the generated images.
 title_font = "assets/fonts/BebasNeue-Regular.ttf"
@@ -18,5 +41,24 @@ STATS_PADDING_Y = 300
 STATS_LINE_HEIGHT = 50
 STATS_SHADOW_OFFSET = 2
 STATS_FONT_SIZE = 40
+STATS_LINE_COUNT = 7
+
+# Rendered summary cards are cached as encoded bytes for CARD_CACHE_TTL seconds within
+# CARD_CACHE_MEMORY_BUDGET bytes. A player keeps the same random skin of a champion for
+# SKIN_PIN_TTL seconds, so repeat lookups produce the same card and can hit that cache.
+CARD_CACHE_MEMORY_BUDGET = 64 * 1024 * 1024
+CARD_CACHE_TTL = 10 * 60
+SKIN_PIN_TTL = 6 * 60 * 60
+SKIN_PIN_MAX_ENTRIES = 20_000
+
+# Lobby grid card: one profile icon panel per player with a few stats lines below it.
+LOBBY_COLUMNS = 5
+LOBBY_CELL_PADDING = 20
+LOBBY_FONT_SIZE = 32
+LOBBY_LINE_HEIGHT = 38
+LOBBY_LINE_COUNT = 4
+
+# Number of (text, font size) measurements memoized by the card template.
+TEXT_SIZE_CACHE_SIZE = 4096
 
 ONE_HOUR = 60 * 60
\ No newline at end of file
@@ -0,0 +1,24 @@
+# ----------------- Stats Service Constants -----------------
+
+# Address of the HTTP stats/render service (stats_service.py). Bind to a private interface;
+# set STATS_SERVICE_TOKEN in .env to require "Authorization: Bearer <token>" on every request.
+SERVICE_HOST = "127.0.0.1"
+SERVICE_PORT = 8080
+
+# Worker processes started by `python stats_service.py`. Each has its own lookup queue and
+# render pool; they share the Riot rate-limit ledger, match cache and asset cache on disk.
+SERVICE_WORKERS = 2
+
+# Seconds a stats or card response may be reused: clients cache it for this long, and a
+# conditional request (If-None-Match) within this window is answered 304 without a lookup.
+SERVICE_MAX_AGE = 60
+SERVICE_ETAG_CACHE_MAX_ENTRIES = 10_000
+
+# Seconds a service request may spend queued and running before it is cancelled.
+SERVICE_JOB_TIMEOUT = 5 * 60
+
+# Bot side (thin client mode, STATS_SERVICE_URL set): total seconds per service request,
+# and how many recent cards are kept for conditional re-requests.
+SERVICE_CLIENT_TIMEOUT = 5 * 60
+SERVICE_CLIENT_CACHE_MAX_ENTRIES = 256
+SERVICE_CLIENT_CACHE_TTL = 60 * 60
@@ -1,140 +1,274 @@
+import asyncio
 import io
+import json
 import logging
-import time
 from random import choice
-from PIL import Image, ImageDraw, ImageFont
-import requests
-from io import BytesIO
+import aiohttp
+from PIL import Image
+from asset_cache import AssetCache
+from card_cache import CardCache, card_key
+from card_encoder import encode_card, encode_stats
+from card_template import get_card_template
+from metrics import metrics
+from single_flight import SingleFlight
+from ttl_cache import TTLCache
 from config.image_constants import *
 from config.API_constants import BODY_JSON_RESPONSE
 
-_version_cache = {"value": None, "timestamp": 0}
-CACHE_TTL = ONE_HOUR  # refresh every hour
+logger = logging.getLogger(__name__)
 
-def get_latest_version():
-    now = time.time()
-    if _version_cache["value"] and now - _version_cache["timestamp"] < CACHE_TTL:
-        return _version_cache["value"]
-    logging.debug("Fetching latest version from API")
-    print("Fetching latest version from API")
+_version_cache = TTLCache("ddragon_version", ONE_HOUR, 1)  # refresh every hour
+_version_flight = SingleFlight("ddragon_version")  # a cold start's concurrent cards share one versions.json request
+_skins_preloaded = False  # warm_up_assets ran, so skin lists are preloaded again after a patch change
+_background_tasks: set[asyncio.Task] = set()
 
-    url = "https://ddragon.leagueoflegends.com/api/versions.json"
-    response = requests.get(url)
-    response.raise_for_status()
-    versions = response.json()
+asset_cache = AssetCache()
+card_cache = CardCache()
+skin_pins = TTLCache("skin_pin", SKIN_PIN_TTL, SKIN_PIN_MAX_ENTRIES)  # (player, champion) -> skin number
+
+async def get_latest_version(session: aiohttp.ClientSession):
+    latest = _version_cache.get("latest")
+    if latest is None:
+        latest = await _version_flight.do("latest", _fetch_latest_version, session)
+    return latest
+
+async def _fetch_latest_version(session: aiohttp.ClientSession):
+    logger.debug("Fetching latest version from API")
+    url = f"{DDRAGON_URL}/api/versions.json"
+    async with session.get(url) as response:
+        response.raise_for_status()
+        versions = await response.json()
     latest = versions[0]
 
-    _version_cache.update({"value": latest, "timestamp": now})
+    changed = asset_cache.version is not None and latest != asset_cache.version
+    await asyncio.to_thread(asset_cache.set_version, latest)  # drops assets and skin lists of older patches
+    _version_cache.put("latest", latest)
+    if changed and _skins_preloaded:
+        # Preload the new patch's skin lists in the background instead of on each champion's first card
+        task = asyncio.create_task(warm_up_assets(session))
+        _background_tasks.add(task)
+        task.add_done_callback(_background_tasks.discard)
     return latest
 
-def get_random_skin(champ):
-    url = f"https://ddragon.leagueoflegends.com/cdn/{get_latest_version()}/data/en_US/champion/{champ}.json"
-    response = requests.get(url)
-    if response.status_code != BODY_JSON_RESPONSE: # 200
-        raise ValueError(f"Failed to fetch skins for {champ}: "
-                         f"HTTP {response.status_code} - {response.text[:BODY_JSON_RESPONSE]}")
-    try:
-        data = response.json()
-    except Exception as e:
-        raise ValueError(f"Invalid JSON for {champ}: {e} (body={response.text[:BODY_JSON_RESPONSE]})")
+async def _get_asset_bytes(session: aiohttp.ClientSession, path: str, url: str) -> bytes:
+    """Return the raw bytes of a ddragon asset from the disk cache, downloading it on a miss."""
+    data = await asyncio.to_thread(asset_cache.read, path)
+    metrics.inc("asset_disk_lookups_total", result="hit" if data is not None else "miss")
+    if data is None:
+        with metrics.span("ddragon_download"):
+            async with session.get(url) as response:
+                response.raise_for_status()
+                data = await response.read()
+        await asyncio.to_thread(asset_cache.write, path, data)
+    return data
+
+async def _get_asset_image(session: aiohttp.ClientSession, path: str, url: str) -> Image.Image:
+    """Return a decoded ddragon image from the memory tier, falling back to disk and then HTTP."""
+    await get_latest_version(session)
+    image = asset_cache.get_image(path)
+    if image is None:
+        data = await _get_asset_bytes(session, path, url)
+        image = await asyncio.to_thread(asset_cache.add_image, path, data)
+    return image
+
+async def get_champion_skins(session: aiohttp.ClientSession, champ):
+    version = await get_latest_version(session)
+    if champ in asset_cache.skins:
+        return asset_cache.skins[champ]
+
+    path = f"data/en_US/champion/{champ}.json"
+    data = await asyncio.to_thread(asset_cache.read_json, path)
+    if data is None:
+        url = f"{DDRAGON_URL}/cdn/{version}/{path}"
+        async with session.get(url) as response:
+            body = await response.text()
+            if response.status != BODY_JSON_RESPONSE: # 200
+                raise ValueError(f"Failed to fetch skins for {champ}: "
+                                 f"HTTP {response.status} - {body[:BODY_JSON_RESPONSE]}")
+            try:
+                data = await response.json(content_type=None)
+            except Exception as e:
+                raise ValueError(f"Invalid JSON for {champ}: {e} (body={body[:BODY_JSON_RESPONSE]})")
+        await asyncio.to_thread(asset_cache.write_json, path, data)
 
     skins = [skin["num"] for skin in data["data"][champ]["skins"]]
-    return choice(skins)
+    asset_cache.skins[champ] = skins
+    return skins
+
+async def get_random_skin(session: aiohttp.ClientSession, champ):
+    return choice(await get_champion_skins(session, champ))
+
+def player_key(stats) -> str:
+    return stats.get("puuid") or f"{stats['name'].lower()}#{stats['tag_line'].lower()}"
+
+async def pinned_skin(session: aiohttp.ClientSession, champ, player):
+    """A random skin of `champ`, kept for `player` for SKIN_PIN_TTL seconds so their card stays the same."""
+    skin_num = skin_pins.get((player, champ))
+    if skin_num is None:
+        skin_num = await get_random_skin(session, champ)
+        skin_pins.put((player, champ), skin_num)
+    return skin_num
 
-def get_champion_splash(stats):
+async def warm_up_assets(session: aiohttp.ClientSession):
+    """
+    Preload the skin lists of every champion so rendering a card needs no champion JSON requests.
+    They are preloaded again whenever get_latest_version sees a new patch.
+    """
+    global _skins_preloaded
+    _skins_preloaded = True
+    version = await get_latest_version(session)
+    path = "data/en_US/championFull.json"
+    data = json.loads(await _get_asset_bytes(session, path, f"{DDRAGON_URL}/cdn/{version}/{path}"))
+    for champ, champion_data in data["data"].items():
+        asset_cache.skins[champ] = [skin["num"] for skin in champion_data["skins"]]
+    logger.info(f"Preloaded skin lists for {len(data['data'])} champions (ddragon {version})")
+
+def card_champion(stats):
+    """Champion whose splash art goes on the card."""
     champ = stats.get("most_played_champion") or stats.get("last_played_champion")
+    return champ.strip() if champ else None  # remove trailing spaces just in case
+
+async def get_champion_splash(session: aiohttp.ClientSession, stats, skin_num=None):
+    champ = card_champion(stats)
     if not champ:
-        print("No champion provided in stats")
+        logger.warning("No champion provided in stats")
         return None
-    
-    champ = champ.strip()  # remove trailing spaces just in case
-    print(f"Fetching splash art for champion: {champ}")
+    return await get_splash_for(session, champ, skin_num)
+
+async def get_splash_for(session: aiohttp.ClientSession, champ, skin_num=None):
+    """Splash art of `champ` in skin `skin_num`, or in a random skin if None."""
+    logger.debug(f"Fetching splash art for champion: {champ}")
 
+    if skin_num is None:
+        try:
+            skin_num = await get_random_skin(session, champ)
+        except Exception as e:
+            logger.warning(f"Error getting skins for {champ}: {e}")
+            return None
+
+    path = f"img/champion/splash/{champ}_{skin_num}.jpg"
     try:
-        skin_num = get_random_skin(champ)
+        return await _get_asset_image(session, path, f"{DDRAGON_URL}/cdn/{path}")
     except Exception as e:
-        print(f"Error getting skins for {champ}: {e}")
+        logger.warning(f"Error fetching champion splash for {champ}: {e}")
         return None
 
-    url = f"https://ddragon.leagueoflegends.com/cdn/img/champion/splash/{champ}_{skin_num}.jpg"
+async def get_profile_icon(session: aiohttp.ClientSession, icon_id):
+    version = await get_latest_version(session)
+    path = f"img/profileicon/{icon_id}.png"
     try:
-        response = requests.get(url)
-        response.raise_for_status()
-        return Image.open(BytesIO(response.content))
+        return await _get_asset_image(session, path, f"{DDRAGON_URL}/cdn/{version}/{path}") # returns image of size (300, 300)
     except Exception as e:
-        print(f"Error fetching champion splash for {champ}: {e}")
-        return None
-
-def get_profile_icon(icon_id):
-    url = f"https://ddragon.leagueoflegends.com/cdn/{get_latest_version()}/img/profileicon/{icon_id}.png"
-    response = requests.get(url)
-    if response.status_code == BODY_JSON_RESPONSE: # 200 OK
-        return Image.open(BytesIO(response.content)) # returns image of size (300, 300)
-    else:
-        print(f"Failed to get profile icon for ID {icon_id}")
+        logger.warning(f"Failed to get profile icon for ID {icon_id}: {e}")
         return None
     
-def generate_icon_image(icon, stats):
-    draw = ImageDraw.Draw(icon, "RGBA")
-
-    # Fonts
-    name_font = ImageFont.truetype(title_font, size=ICON_FONT_SIZE)
-    small_font = ImageFont.truetype(title_font, size=ICON_FONT_SIZE)
-
-    # Text strings
-    name_text = f"{stats['name']}"
-    tagline_text = f"#{stats['tag_line']}"
-    level_text = f"Level {stats['profile_summoner_level']}"
+class AssetPrefetcher:
+    """
+    Starts the splash and profile icon downloads as soon as a lookup learns the champion or icon ID
+    (pass it as `prefetch` to RiotAPIClient.calculate_stats), so they overlap the match fetches.
+    generate_summary_image then awaits the started downloads instead of beginning its own, unless
+    the finished stats ended up featuring another champion or icon. Nothing is prefetched for a
+    player with a card in `card_cache`, since their card is then most likely served from it.
+    """
+    def __init__(self, session: aiohttp.ClientSession):
+        self.session = session
+        self._icon: tuple[int, asyncio.Task] | None = None
+        self._splash: tuple[str, asyncio.Task] | None = None
+        self.skipped = False  # a prefetch was left out because the player's card is cached
 
-    # Padding values
-    padding = ICON_FONT_Y_PADDING
-    bottom_padding = 6  # extra space below the level
+    def __call__(self, profile_icon_id=None, champion=None, player=None):
+        if player is not None and card_cache.has_player(player):
+            self.skipped = True
+            return
+        if profile_icon_id is not None and (self._icon is None or self._icon[0] != profile_icon_id):
+            self._icon = (profile_icon_id, asyncio.create_task(get_profile_icon(self.session, profile_icon_id)))
+        if champion:
+            champion = champion.strip()
+            if self._splash is None or self._splash[0] != champion:
+                self._splash = (champion, asyncio.create_task(self._fetch_splash(champion, player)))
 
-    # Helper to measure text
-    def text_size(draw, text, font):
-        left, top, right, bottom = draw.textbbox((0, 0), text, font=font)
-        return right - left, bottom - top
+    async def _fetch_splash(self, champion, player):
+        """(skin number, splash) of the player's pinned skin, or of a random one without a player."""
+        try:
+            skin_num = await pinned_skin(self.session, champion, player) if player else None
+        except Exception as e:
+            logger.warning(f"Error getting skins for {champion}: {e}")
+            return None, None
+        return skin_num, await get_splash_for(self.session, champion, skin_num)
 
-    name_w, name_h = text_size(draw, name_text, name_font)
-    tagline_w, tagline_h = text_size(draw, tagline_text, small_font)
-    level_w, level_h = text_size(draw, level_text, small_font)
+    def cancel(self):
+        """Stop downloads that turned out to be unneeded, e.g. because the card was cached."""
+        for started in (self._icon, self._splash):
+            if started is not None:
+                started[1].cancel()
 
-    # Overlay height includes extra padding below level
-    box_height = name_h + tagline_h + level_h + padding * 4 + bottom_padding
-    y_start = icon.height - box_height + padding
+    def _missed(self, asset: str):
+        metrics.inc("asset_prefetch_total", asset=asset, result="skipped" if self.skipped else "missed")
 
-    # Semi-transparent rectangle background
-    overlay = Image.new("RGBA", (icon.width, box_height), STATS_RGBA)
-    icon.paste(overlay, (0, icon.height - box_height), overlay)
+    async def icon(self, icon_id):
+        if self._icon is not None and self._icon[0] == icon_id:
+            metrics.inc("asset_prefetch_total", asset="icon", result="used")
+            return await self._icon[1]
+        self._missed("icon")
+        return await get_profile_icon(self.session, icon_id)
 
-    # Draw shadow
-    shadow_offset = STATS_SHADOW_OFFSET
-    for dx, dy in [(shadow_offset, shadow_offset)]:
-        draw.text((padding + dx, y_start + dy), name_text, font=name_font, fill="black")
-        draw.text((padding + dx, y_start + name_h + padding + dy), tagline_text, font=small_font, fill="black")
-        draw.text((padding + dx, y_start + name_h + tagline_h + padding*2 + dy), level_text, font=small_font, fill="black")
+    async def splash(self, stats, skin_num=None):
+        champ = card_champion(stats)
+        if champ and self._splash is not None and self._splash[0] == champ:
+            prefetched_skin, splash = await self._splash[1]
+            if skin_num is None or prefetched_skin == skin_num:
+                metrics.inc("asset_prefetch_total", asset="splash", result="used")
+                return splash
+        self._missed("splash")
+        return await get_champion_splash(self.session, stats, skin_num)
 
-    # Draw foreground text
-    draw.text((padding, y_start), name_text, font=name_font, fill="white")
-    draw.text((padding, y_start + name_h + padding), tagline_text, font=small_font, fill="white")
-    draw.text((padding, y_start + name_h + tagline_h + padding*2), level_text, font=small_font, fill="white")
-
-    return icon
-
-def generate_summary_image(stats):
-    bg = get_champion_splash(stats) or Image.new("RGB", CHAMPION_SPLASH_SIZE, FALLBACK_BG_RGB) # Fallback background if splash not found
+def generate_icon_image(icon, stats):
+    return get_card_template().draw_icon_panel(icon, stats)
 
-    icon = get_profile_icon(stats["profile_icon_id"]) or Image.new("RGB", PROFILE_ICON_SIZE, FALLBACK_ICON_RGB)
-    if icon:
-        icon = generate_icon_image(icon, stats)
-        bg.paste(icon, (0, 0))
+async def generate_summary_image(session: aiohttp.ClientSession, stats, executor=None, output_format=CARD_OUTPUT_FORMAT, prefetched: AssetPrefetcher | None = None):
+    """
+    Return the summary card from `card_cache` if an identical one (same stats, ddragon version and
+    pinned skin) was rendered recently, cancelling any downloads `prefetched` started. Otherwise download the splash art and profile icon
+    concurrently (or await the downloads `prefetched` already started), render the card off the
+    event loop, in `executor` (a render_pool.RenderExecutor) if given, and cache it.
+    Returns the encoded card and its file name, e.g. (BytesIO, "summary.webp").
+    """
+    champ = card_champion(stats)
+    skin_num = None
+    if champ:
+        try:
+            skin_num = await pinned_skin(session, champ, player_key(stats))
+        except Exception as e:
+            logger.warning(f"Error getting skins for {champ}: {e}")
+    key = card_key(stats, await get_latest_version(session), champ, skin_num, output_format)
+    cached = card_cache.get(key)
+    metrics.inc("card_cache_lookups_total", result="hit" if cached is not None else "miss")
+    if cached is not None:
+        if prefetched is not None:
+            prefetched.cancel()
+        data, extension = cached
+        return io.BytesIO(data), f"summary.{extension}"
 
-    draw = ImageDraw.Draw(bg, "RGBA")
-    font = ImageFont.truetype(title_font, size=STATS_FONT_SIZE)
+    if prefetched is not None:
+        downloads = prefetched.splash(stats, skin_num), prefetched.icon(stats["profile_icon_id"])
+    else:
+        downloads = get_champion_splash(session, stats, skin_num), get_profile_icon(session, stats["profile_icon_id"])
+    with metrics.span("assets"):
+        splash, icon = await asyncio.gather(*downloads)
+    with metrics.span("render"):
+        if executor is not None:
+            data, extension = await executor.render(stats, splash, icon, output_format)
+        else:
+            data, extension, attempts = await asyncio.to_thread(render_summary_image, stats, splash, icon, output_format)
+            encode_stats.record(attempts)
+    if icon is not None and (splash is not None or not champ):  # don't keep fallback art for a whole TTL
+        card_cache.put(key, data, extension, player_key(stats))
+    return io.BytesIO(data), f"summary.{extension}"
 
-    # Stats to display
+def summary_lines(stats):
+    """Stats to display on the card, one string per line."""
     single_game = stats['games'] == 1
-    stats_text = [
+    return [
         f"Winrate: {stats['winrate']}%",
         f"KDA: {stats['kda']}",
         f"{'CS' if single_game else 'Average CS'}: {round(stats['avg_cs'], 1)}",
@@ -144,29 +278,40 @@ def generate_summary_image(stats):
         f"Games Analyzed: {stats['games']}"
     ]
 
+def lobby_lines(stats):
+    """Stats shown below a player's icon on the lobby card."""
+    champion = stats.get("most_played_champion") or stats.get("last_played_champion") or "-"
+    return [
+        f"{stats['winrate']}% WR, {stats['games']} games",
+        f"KDA {stats['kda']}",
+        f"{stats['cs_per_min']} CS/min",
+        f"Main: {champion}",
+    ]
+
+def render_lobby_image(players, output_format=CARD_OUTPUT_FORMAT):
+    """Render and encode the lobby grid from (stats, icon) pairs; returns (data, file extension, encode attempts)."""
+    grid = get_card_template().render_lobby([(stats, icon, lobby_lines(stats)) for stats, icon in players])
+    return encode_card(grid, output_format)
+
+async def generate_lobby_image(session: aiohttp.ClientSession, players_stats, executor=None, output_format=CARD_OUTPUT_FORMAT):
+    """
+    Download every player's profile icon concurrently and render the lobby grid card,
+    in `executor` (a render_pool.RenderExecutor) if given.
+    Returns the encoded card and its file name, e.g. (BytesIO, "lobby.webp").
+    """
+    with metrics.span("assets", card="lobby"):
+        icons = await asyncio.gather(*(get_profile_icon(session, stats["profile_icon_id"]) for stats in players_stats))
+    players = list(zip(players_stats, icons))
+    with metrics.span("render", card="lobby"):
+        if executor is not None:
+            data, extension = await executor.render_lobby(players, output_format)
+        else:
+            data, extension, attempts = await asyncio.to_thread(render_lobby_image, players, output_format)
+            encode_stats.record(attempts)
+    return io.BytesIO(data), f"lobby.{extension}"
 
-    # Padding & placement
-    padding_x = STATS_PADDING_X
-    padding_y = STATS_PADDING_Y
-    line_height = STATS_LINE_HEIGHT
-    shadow_offset = STATS_SHADOW_OFFSET
-
-    # Semi-transparent overlay behind stats
-    overlay_height = line_height * len(stats_text) + STATS_FONT_SIZE
-    overlay_width = bg.width - padding_x - STATS_FONT_SIZE
-    overlay = Image.new("RGBA", (overlay_width, overlay_height), STATS_RGBA)
-    bg.paste(overlay, (padding_x - 20, padding_y - 20), overlay)
-
-    # Draw each line with shadow for readability
-    for i, text in enumerate(stats_text):
-        y = padding_y + i * line_height
-        # Shadow
-        draw.text((padding_x + shadow_offset, y + shadow_offset), text, font=font, fill="black")
-        # Foreground
-        draw.text((padding_x, y), text, font=font, fill="white")
-
-    # Output as PNG in memory
-    output = io.BytesIO()
-    bg.save(output, format="PNG")
-    output.seek(0)
-    return output
+def render_summary_image(stats, splash, icon, output_format=CARD_OUTPUT_FORMAT):
+    """Render and encode the card; returns (data, file extension, encode attempts) as from encode_card."""
+    # Fallback background and icon come from the template if the assets weren't found
+    bg = get_card_template().render(stats, summary_lines(stats), splash, icon)
+    return encode_card(bg, output_format)
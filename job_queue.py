@@ -0,0 +1,136 @@
+import asyncio
+import itertools
+import logging
+import math
+import time
+from config.bot_constants import LOOKUP_QUEUE_AGING, LOOKUP_QUEUE_MAX_DEPTH, LOOKUP_WORKERS
+from metrics import metrics
+
+class QueueFull(Exception):
+    pass
+
+class _Job:
+    __slots__ = ("cost", "seq", "func", "args", "kwargs", "future", "on_position", "enqueued_at", "task")
+
+    def __init__(self, cost: float, seq: int, func, args, kwargs, on_position):
+        self.cost = cost
+        self.seq = seq
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.future = asyncio.get_running_loop().create_future()
+        self.on_position = on_position
+        self.enqueued_at = time.monotonic()
+        self.task: asyncio.Task | None = None
+
+    def rank(self, now: float) -> tuple[float, int]:
+        # Cheapest first, but every second in the queue lowers a job's cost so big scans still run
+        return self.cost - (now - self.enqueued_at) * LOOKUP_QUEUE_AGING, self.seq
+
+class JobQueue:
+    """
+    Admission control for lookups: at most `workers` jobs run at once and at most `max_depth`
+    wait; beyond that `submit` raises QueueFull. Waiting jobs start cheapest first by their
+    estimated cost (e.g. the match details they still need), with aging so expensive jobs are
+    not starved. `on_position(position, eta_seconds)` is awaited whenever a job's place in the
+    queue changes. Cancelling the `submit` call removes the job from the queue or cancels it if running.
+    """
+    def __init__(self, name: str, workers: int = LOOKUP_WORKERS, max_depth: int = LOOKUP_QUEUE_MAX_DEPTH):
+        self.name = name
+        self.workers = workers
+        self.max_depth = max_depth
+        self.running = 0
+        self.completed = 0
+        self.rejected = 0
+        self.cancelled = 0
+        self.avg_duration = 5.0  # seconds, exponentially weighted
+        self.logger = logging.getLogger(__name__)
+        self._waiting: list[_Job] = []
+        self._seq = itertools.count()
+
+    async def submit(self, cost: float, func, *args, on_position=None, **kwargs):
+        """Queue `func(*args, **kwargs)` and return its result once a worker slot has run it."""
+        if len(self._waiting) >= self.max_depth:
+            self.rejected += 1
+            metrics.inc("job_queue_rejected_total", queue=self.name)
+            raise QueueFull(f"{self.name} queue is full ({self.max_depth} waiting)")
+        job = _Job(cost, next(self._seq), func, args, kwargs, on_position)
+        self._waiting.append(job)
+        self._dispatch()
+        try:
+            if job.task is None:
+                await self._notify(job)  # inside the try: a caller cancelled here must still leave the queue
+            return await asyncio.shield(job.future)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            metrics.inc("job_queue_cancelled_total", queue=self.name)
+            job.future.add_done_callback(lambda f: f.cancelled() or f.exception())  # nobody will read it
+            if job in self._waiting:
+                self._waiting.remove(job)
+            elif job.task is not None:
+                job.task.cancel()
+            raise
+
+    def position(self, job: _Job) -> int:
+        """1-based place of a waiting job in start order."""
+        now = time.monotonic()
+        rank = job.rank(now)
+        return 1 + sum(other.rank(now) < rank for other in self._waiting)
+
+    def eta(self, position: int) -> float:
+        """Rough seconds until the job at `position` starts: one average job duration per full round of workers."""
+        return math.ceil(position / max(1, self.workers)) * self.avg_duration
+
+    async def _notify(self, job: _Job):
+        if job.on_position is None:
+            return
+        position = self.position(job)
+        try:
+            await job.on_position(position, self.eta(position))
+        except Exception as e:
+            self.logger.debug(f"Queue position callback failed: {e}")
+
+    def _dispatch(self):
+        """Start the best waiting jobs while worker slots are free."""
+        started = False
+        while self._waiting and self.running < self.workers:
+            now = time.monotonic()
+            job = min(self._waiting, key=lambda j: j.rank(now))
+            self._waiting.remove(job)
+            self.running += 1
+            metrics.observe("job_queue_wait_seconds", now - job.enqueued_at, queue=self.name)
+            job.task = asyncio.create_task(self._run(job))
+            started = True
+        if started:
+            for waiting in list(self._waiting):
+                if waiting.on_position is not None:
+                    asyncio.create_task(self._notify(waiting))
+
+    async def _run(self, job: _Job):
+        start = time.monotonic()
+        try:
+            result = await job.func(*job.args, **job.kwargs)
+            if not job.future.done():
+                job.future.set_result(result)
+        except asyncio.CancelledError:
+            if not job.future.done():
+                job.future.cancel()
+        except Exception as e:
+            if not job.future.done():
+                job.future.set_exception(e)
+        finally:
+            if not job.future.cancelled():  # cut-short jobs would skew the wait estimate
+                self.avg_duration = 0.8 * self.avg_duration + 0.2 * (time.monotonic() - start)
+                self.completed += 1
+            self.running -= 1
+            self._dispatch()
+
+    def stats(self) -> dict[str, float]:
+        return {
+            "running": self.running,
+            "waiting": len(self._waiting),
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "cancelled": self.cancelled,
+            "avg_duration_s": round(self.avg_duration, 2),
+        }
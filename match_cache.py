@@ -0,0 +1,102 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from config.API_constants import MATCH_CACHE_EVICT_EVERY, MATCH_CACHE_MAX_ENTRIES, MATCH_CACHE_PATH, MATCH_CACHE_TOUCH_INTERVAL
+
+class MatchCache:
+    """
+    Persistent store of finished match-v5 payloads keyed by match ID.
+    Payloads are zlib-compressed JSON in a single SQLite table; once the table grows past
+    `max_entries` the least recently used matches are evicted. To keep reads cheap, access times
+    are only updated when older than MATCH_CACHE_TOUCH_INTERVAL, and the size is only checked every
+    MATCH_CACHE_EVICT_EVERY inserts, so the table may briefly hold a few more than `max_entries`.
+    """
+    def __init__(self, path: str = MATCH_CACHE_PATH, max_entries: int = MATCH_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._inserts = 0  # since the last size check
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # Accessed from worker threads via asyncio.to_thread, guarded by self._lock.
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS matches ("
+            "match_id TEXT PRIMARY KEY, "
+            "payload BLOB NOT NULL, "
+            "last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS matches_last_access ON matches (last_access)")
+        self._conn.commit()
+
+    def get(self, match_id: str) -> dict | None:
+        """Return the cached match payload, or None on a miss."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT payload, last_access FROM matches WHERE match_id = ?", (match_id,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            now = time.time()
+            if now - row[1] > MATCH_CACHE_TOUCH_INTERVAL:
+                self._conn.execute("UPDATE matches SET last_access = ? WHERE match_id = ?", (now, match_id))
+                self._conn.commit()
+            self.hits += 1
+        return json.loads(zlib.decompress(row[0]))
+
+    def put(self, match_id: str, match_data: dict):
+        """Store a match payload, evicting the least recently used entries if over budget."""
+        payload = zlib.compress(json.dumps(match_data, separators=(",", ":")).encode("utf-8"))
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO matches (match_id, payload, last_access) VALUES (?, ?, ?)",
+                (match_id, payload, time.time()),
+            )
+            self._inserts += 1
+            if self._inserts >= MATCH_CACHE_EVICT_EVERY:
+                self._inserts = 0
+                self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        """Delete the least recently used matches beyond `max_entries`; call with self._lock held."""
+        overflow = self._conn.execute("SELECT COUNT(*) FROM matches").fetchone()[0] - self.max_entries
+        if overflow > 0:
+            self._conn.execute(
+                "DELETE FROM matches WHERE match_id IN "
+                "(SELECT match_id FROM matches ORDER BY last_access ASC LIMIT ?)",
+                (overflow,),
+            )
+            self.logger.debug(f"Evicted {overflow} matches from cache")
+
+    def warm_up(self) -> int:
+        """Read the primary key index once, so the first lookups after a restart don't wait on cold disk pages."""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(match_id) FROM matches").fetchone()[0]
+
+    def stats(self) -> dict[str, int | float]:
+        """Return hit/miss counters and the current number of stored matches."""
+        with self._lock:
+            size = self._conn.execute("SELECT COUNT(*) FROM matches").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups * 100, 2) if lookups else 0, # * 100 for percentage conversion
+            "entries": size,
+        }
+
+    def close(self):
+        """Close the underlying SQLite connection."""
+        with self._lock:
+            self._conn.close()
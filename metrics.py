@@ -0,0 +1,146 @@
+import logging
+import time
+from collections import deque
+from contextlib import contextmanager
+from aiohttp import web
+
+# Upper bounds in seconds of the latency histogram buckets (Prometheus "le" labels).
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+# Recent observations kept per histogram for the percentiles in !perf.
+RECENT_SAMPLES = 1000
+
+def _label_key(labels: dict) -> tuple:
+    return tuple(sorted(labels.items()))
+
+def _format_labels(key: tuple, extra: tuple = ()) -> str:
+    pairs = key + extra
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in pairs) + "}"
+
+class Histogram:
+    """Cumulative bucket counts plus a window of recent samples for percentiles."""
+    def __init__(self, buckets: tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.recent = deque(maxlen=RECENT_SAMPLES)
+
+    def observe(self, value: float):
+        self.count += 1
+        self.sum += value
+        self.recent.append(value)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+
+    def percentile(self, pct: float) -> float:
+        if not self.recent:
+            return 0.0
+        ordered = sorted(self.recent)
+        return ordered[min(len(ordered) - 1, int(pct / 100 * len(ordered)))]
+
+class Metrics:
+    """
+    Process-wide registry of counters and latency histograms, keyed by name and labels.
+    Collectors registered with `register_collector` are polled at export time for gauges
+    such as cache sizes and hit counts that other components already track.
+    """
+    def __init__(self, namespace: str = "oracle"):
+        self.namespace = namespace
+        self.counters: dict[str, dict[tuple, float]] = {}
+        self.histograms: dict[str, dict[tuple, Histogram]] = {}
+        self._collectors = []
+
+    def inc(self, name: str, value: float = 1, **labels):
+        series = self.counters.setdefault(name, {})
+        key = _label_key(labels)
+        series[key] = series.get(key, 0) + value
+
+    def observe(self, name: str, seconds: float, **labels):
+        series = self.histograms.setdefault(name, {})
+        key = _label_key(labels)
+        if key not in series:
+            series[key] = Histogram()
+        series[key].observe(seconds)
+
+    @contextmanager
+    def span(self, stage: str, **labels):
+        """Time the enclosed block (sync or containing awaits) into the stage_seconds histogram."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe("stage_seconds", time.perf_counter() - start, stage=stage, **labels)
+
+    def register_collector(self, collector):
+        """`collector()` returns {gauge name: value} or {gauge name: {label value: value}}."""
+        self._collectors.append(collector)
+
+    def _collect(self) -> dict:
+        gauges = {}
+        for collector in self._collectors:
+            try:
+                gauges.update(collector())
+            except Exception as e:
+                logging.getLogger(__name__).warning(f"Metrics collector failed: {e}")
+        return gauges
+
+    def render_prometheus(self) -> str:
+        """Prometheus text exposition format of every counter, histogram and collected gauge."""
+        lines = []
+        for name, series in sorted(self.counters.items()):
+            full = f"{self.namespace}_{name}"
+            lines.append(f"# TYPE {full} counter")
+            lines += [f"{full}{_format_labels(key)} {value}" for key, value in series.items()]
+        for name, series in sorted(self.histograms.items()):
+            full = f"{self.namespace}_{name}"
+            lines.append(f"# TYPE {full} histogram")
+            for key, hist in series.items():
+                for bound, count in zip(hist.buckets, hist.counts):
+                    lines.append(f"{full}_bucket{_format_labels(key, (('le', bound),))} {count}")
+                lines.append(f"{full}_bucket{_format_labels(key, (('le', '+Inf'),))} {hist.count}")
+                lines.append(f"{full}_sum{_format_labels(key)} {hist.sum}")
+                lines.append(f"{full}_count{_format_labels(key)} {hist.count}")
+        for name, value in sorted(self._collect().items()):
+            full = f"{self.namespace}_{name}"
+            lines.append(f"# TYPE {full} gauge")
+            if isinstance(value, dict):
+                lines += [f'{full}{{key="{label}"}} {v}' for label, v in value.items()]
+            else:
+                lines.append(f"{full} {value}")
+        return "\n".join(lines) + "\n"
+
+    def summary(self) -> list[str]:
+        """Human-readable per-stage latency and counter lines for the !perf command."""
+        lines = []
+        for key, hist in sorted(self.histograms.get("stage_seconds", {}).items()):
+            label = ",".join(str(value) for _, value in key)
+            lines.append(
+                f"{label:<22} n={hist.count:<6} p50={hist.percentile(50) * 1000:>7.0f}ms "
+                f"p95={hist.percentile(95) * 1000:>7.0f}ms p99={hist.percentile(99) * 1000:>7.0f}ms"
+            )
+        for name, series in sorted(self.counters.items()):
+            for key, value in series.items():
+                label = ",".join(str(v) for _, v in key)
+                lines.append(f"{name}{'[' + label + ']' if label else ''} = {value:g}")
+        for name, value in sorted(self._collect().items()):
+            lines.append(f"{name} = {value}")
+        return lines
+
+metrics = Metrics()
+
+async def start_metrics_server(host: str, port: int) -> web.AppRunner:
+    """Serve `metrics` in Prometheus text format at http://host:port/metrics."""
+    async def handle(request: web.Request):
+        return web.Response(text=metrics.render_prometheus(), content_type="text/plain", charset="utf-8")
+
+    app = web.Application()
+    app.router.add_get("/metrics", handle)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logging.getLogger(__name__).info(f"Serving metrics on http://{host}:{port}/metrics")
+    return runner
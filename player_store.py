@@ -0,0 +1,185 @@
+from collections import Counter, OrderedDict
+import numpy as np
+from config.API_constants import PLAYER_STATE_MAX_MATCHES, PLAYER_STORE_MAX_PLAYERS
+
+# Numeric columns kept per match, in the order of PlayerState.values / running totals.
+STAT_COLUMNS = ("wins", "kills", "deaths", "assists", "cs", "gold", "damage", "time_played")
+
+class ParticipantRecord:
+    """The handful of fields we aggregate from one participant of a match-v5 payload (of 100+ keys)."""
+    __slots__ = ("match_id", "game_start", "champion", "win", "kills", "deaths", "assists", "cs", "gold", "damage", "time_played")
+
+    def __init__(self, match_id: str, game_start: int, participant: dict):
+        self.match_id = match_id
+        self.game_start = game_start  # epoch milliseconds
+        self.champion = participant["championName"]
+        self.win = bool(participant["win"])
+        self.kills = participant["kills"]
+        self.deaths = participant["deaths"]
+        self.assists = participant["assists"]
+        self.cs = participant.get("totalMinionsKilled", 0) + participant.get("neutralMinionsKilled", 0)
+        self.gold = participant["goldEarned"]
+        self.damage = participant["totalDamageDealtToChampions"]
+        self.time_played = participant["timePlayed"]
+
+    def row(self) -> tuple[int, ...]:
+        """Numeric values in STAT_COLUMNS order."""
+        return (int(self.win), self.kills, self.deaths, self.assists, self.cs, self.gold, self.damage, self.time_played)
+
+def participant_records(match_data: dict, puuids) -> dict[str, ParticipantRecord]:
+    """Return a compact record for every participant of `match_data` whose PUUID is in `puuids`."""
+    match_id = match_data["metadata"]["matchId"]
+    game_start = match_data["info"].get("gameStartTimestamp", 0)
+    return {
+        p["puuid"]: ParticipantRecord(match_id, game_start, p)
+        for p in match_data["info"]["participants"] if p["puuid"] in puuids
+    }
+
+def compact_participant(match_data: dict, puuid: str) -> ParticipantRecord | None:
+    """Return the compact record of `puuid` in a match-v5 payload, or None if they didn't play in it."""
+    return participant_records(match_data, {puuid}).get(puuid)
+
+def stat_matrix(records: list[ParticipantRecord]) -> np.ndarray:
+    """Stack records into an (n_matches, len(STAT_COLUMNS)) int64 matrix."""
+    if not records:
+        return np.zeros((0, len(STAT_COLUMNS)), dtype=np.int64)
+    return np.array([r.row() for r in records], dtype=np.int64)
+
+def totals_from(values: np.ndarray, champions) -> dict:
+    """Column sums of a stat matrix as a totals dict, plus game and champion counts."""
+    totals = dict(zip(STAT_COLUMNS, values.sum(axis=0).tolist()))
+    totals["games"] = int(values.shape[0])
+    totals["champions"] = champions if isinstance(champions, Counter) else Counter(champions)
+    return totals
+
+def totals_from_running(running: np.ndarray, games: int, champion_counts: Counter) -> dict:
+    """Totals dict from an already summed STAT_COLUMNS vector."""
+    totals = dict(zip(STAT_COLUMNS, running.tolist()))
+    totals["games"] = games
+    totals["champions"] = champion_counts
+    return totals
+
+def totals_of(records: list[ParticipantRecord]) -> dict:
+    return totals_from(stat_matrix(records), [r.champion for r in records])
+
+class PlayerState:
+    """
+    What we know about one player's ranked history, stored column-wise (newest first):
+    match IDs, start times and champions as plain columns, the numeric stats as an int64
+    matrix, plus running totals over it so a repeat lookup only has to fetch games played since.
+    Match IDs that were listed but whose details couldn't be fetched are kept in `unfetched`, so
+    the next update retries them and paging for older games doesn't skip past them.
+    """
+    def __init__(self):
+        self.match_ids: list[str] = []
+        self.champions: list[str] = []
+        self.starts = np.zeros(0, dtype=np.int64)
+        self.values = np.zeros((0, len(STAT_COLUMNS)), dtype=np.int64)
+        self.running = np.zeros(len(STAT_COLUMNS), dtype=np.int64)
+        self.champion_counts = Counter()
+        self.exhausted = False  # True once Riot has no older games than the oldest we hold
+        self.unfetched: set[str] = set()  # listed match IDs missing from the columns, retried on the next update
+
+    def __len__(self):
+        return len(self.match_ids)
+
+    @property
+    def listed(self) -> int:
+        """How many of the player's newest match IDs the state accounts for: stored plus unfetched."""
+        return len(self.match_ids) + len(self.unfetched)
+
+    @property
+    def newest_match_id(self) -> str | None:
+        return self.match_ids[0] if self.match_ids else None
+
+    @property
+    def newest_timestamp(self) -> int | None:
+        """Start time in epoch milliseconds of the newest match we hold."""
+        return int(self.starts[0]) if self.match_ids else None
+
+    @property
+    def last_played_champion(self) -> str | None:
+        return self.champions[0] if self.champions else None
+
+    @property
+    def totals(self) -> dict:
+        return totals_from_running(self.running, len(self), self.champion_counts)
+
+    def merge(self, records: list[ParticipantRecord], max_matches: int = PLAYER_STATE_MAX_MATCHES):
+        """Merge newly fetched records, keeping the newest `max_matches` and the totals in step."""
+        known = set(self.match_ids)
+        added = [r for r in records if r.match_id not in known]
+        if not added:
+            return
+        self.unfetched.difference_update(r.match_id for r in added)
+        new_values = stat_matrix(added)
+        self.running += new_values.sum(axis=0)
+        self.champion_counts.update(r.champion for r in added)
+
+        starts = np.concatenate([self.starts, np.array([r.game_start for r in added], dtype=np.int64)])
+        order = np.argsort(-starts, kind="stable")
+        match_ids = self.match_ids + [r.match_id for r in added]
+        champions = self.champions + [r.champion for r in added]
+        values = np.concatenate([self.values, new_values])
+
+        # Drop the oldest beyond max_matches from the running totals as well
+        keep, dropped = order[:max_matches], order[max_matches:]
+        if dropped.size:
+            self.running -= values[dropped].sum(axis=0)
+            self.champion_counts.subtract(champions[i] for i in dropped)
+            self.champion_counts = +self.champion_counts  # drop zero counts
+            self.exhausted = False
+
+        self.starts = starts[keep]
+        self.values = values[keep]
+        self.match_ids = [match_ids[i] for i in keep]
+        self.champions = [champions[i] for i in keep]
+
+    def mark_unfetched(self, match_ids):
+        """Remember which of the listed `match_ids` still have no record, so they are fetched again."""
+        known = set(self.match_ids)
+        self.unfetched.update(match_id for match_id in match_ids if match_id not in known)
+
+    def head(self, match_count: int) -> "PlayerState":
+        """A new state holding only the newest `match_count` matches."""
+        head = PlayerState()
+        head.match_ids = self.match_ids[:match_count]
+        head.champions = self.champions[:match_count]
+        head.starts = self.starts[:match_count].copy()
+        head.values = self.values[:match_count].copy()
+        head.running = head.values.sum(axis=0)
+        head.champion_counts = Counter(head.champions)
+        head.exhausted = self.exhausted and match_count >= len(self)
+        return head
+
+    def totals_for(self, match_count: int) -> dict:
+        """Totals over the newest `match_count` matches."""
+        if match_count >= len(self):
+            return self.totals
+        return totals_from(self.values[:match_count], self.champions[:match_count])
+
+class PlayerStatsStore:
+    """In-memory PUUID -> PlayerState map, evicting the least recently looked-up players."""
+    def __init__(self, max_players: int = PLAYER_STORE_MAX_PLAYERS):
+        self.max_players = max_players
+        self._players: OrderedDict[str, PlayerState] = OrderedDict()
+
+    def get(self, puuid: str) -> PlayerState | None:
+        state = self._players.get(puuid)
+        if state is not None:
+            self._players.move_to_end(puuid)
+        return state
+
+    def get_or_create(self, puuid: str) -> PlayerState:
+        state = self.get(puuid)
+        if state is None:
+            state = self._players[puuid] = PlayerState()
+            if len(self._players) > self.max_players:
+                self._players.popitem(last=False)
+        return state
+
+    def discard(self, puuid: str):
+        self._players.pop(puuid, None)
+
+    def __len__(self):
+        return len(self._players)
@@ -0,0 +1,178 @@
+import asyncio
+import logging
+import math
+import time
+from contextvars import ContextVar
+from config.API_constants import BACKGROUND_POLL_INTERVAL, BACKGROUND_RESERVED_SHARE, DEFAULT_APP_RATE_LIMIT
+from metrics import metrics
+
+# Set by background work (e.g. the watchlist refresher); tasks it starts inherit the value, so all of
+# its requests only use rate-limit budget that live traffic leaves over.
+background_priority: ContextVar[bool] = ContextVar("background_priority", default=False)
+
+class _Window:
+    """A single fixed rate-limit window, e.g. 100 requests per 120 seconds."""
+    __slots__ = ("limit", "seconds", "count", "reset_at")
+
+    def __init__(self, limit: int, seconds: int):
+        self.limit = limit
+        self.seconds = seconds
+        self.count = 0
+        self.reset_at = 0.0
+
+    def wait_time(self, now: float, reserved: float = 0.0) -> float:
+        """Seconds until this window has room for one more request, leaving a `reserved` share of it unused."""
+        if now >= self.reset_at or self.count < self.limit - math.ceil(self.limit * reserved):
+            return 0.0
+        return self.reset_at - now
+
+    def consume(self, now: float):
+        if now >= self.reset_at:
+            self.count = 0
+            self.reset_at = now + self.seconds
+        self.count += 1
+
+def parse_rate_limit_header(value: str | None) -> list[tuple[int, int]]:
+    """Parse a Riot limit/count header such as "20:1,100:120" into (amount, seconds) pairs."""
+    if not value:
+        return []
+    pairs = []
+    for part in value.split(","):
+        amount, _, seconds = part.strip().partition(":")
+        if amount.isdigit() and seconds.isdigit():
+            pairs.append((int(amount), int(seconds)))
+    return pairs
+
+class RateLimiter:
+    """
+    Client-side scheduler for the Riot API rate limits.
+    Keeps the application limit per routing value (americas, europe, na1, euw1, ...) and the
+    method limit per (routing value, endpoint), both learned from the X-App-Rate-Limit and
+    X-Method-Rate-Limit response headers, and only lets a request start once every window
+    it counts against has room.
+    """
+    def __init__(self, default_app_limit: str = DEFAULT_APP_RATE_LIMIT):
+        self.default_app_limit = parse_rate_limit_header(default_app_limit)
+        self._app_windows: dict[str, list[_Window]] = {}
+        self._method_windows: dict[tuple[str, str], list[_Window]] = {}
+        self._blocked_until: dict[str, float] = {}
+        self.total_wait = 0.0
+        self._live_waiting: dict[str, int] = {}  # routing -> live requests currently waiting for budget
+        self.logger = logging.getLogger(__name__)
+
+    def _app(self, routing: str) -> list[_Window]:
+        if routing not in self._app_windows:
+            self._app_windows[routing] = [_Window(limit, seconds) for limit, seconds in self.default_app_limit]
+        return self._app_windows[routing]
+
+    def _method(self, routing: str, method: str) -> list[_Window]:
+        # Unknown until the first response for this endpoint tells us its limit.
+        return self._method_windows.setdefault((routing, method), [])
+
+    def _wait_time(self, routing: str, method: str, now: float, background: bool = False) -> float:
+        blocked = max(
+            self._blocked_until.get(routing, 0.0),
+            self._blocked_until.get(f"{routing}:{method}", 0.0),
+        ) - now
+        windows = self._app(routing) + self._method(routing, method)
+        if not background:
+            return max([blocked] + [w.wait_time(now) for w in windows])
+        wait = max([blocked] + [w.wait_time(now, BACKGROUND_RESERVED_SHARE) for w in windows])
+        if self._live_waiting.get(routing):
+            wait = max(wait, BACKGROUND_POLL_INTERVAL)  # live requests are queued, step aside
+        return wait
+
+    def _try_consume(self, routing: str, method: str, background: bool) -> float:
+        """Count the request and return 0 if it fits now, else return how long to wait before retrying."""
+        now = time.monotonic()
+        wait = self._wait_time(routing, method, now, background)
+        if wait <= 0:
+            for window in self._app(routing) + self._method(routing, method):
+                window.consume(now)
+        return wait
+
+    async def _reserve(self, routing: str, method: str, background: bool) -> float:
+        return self._try_consume(routing, method, background)
+
+    async def acquire(self, routing: str, method: str):
+        """
+        Wait until a request to `method` on `routing` fits in every known window, then count it.
+        Background requests (see `background_priority`) additionally keep BACKGROUND_RESERVED_SHARE
+        of every window free and never start while a live request is waiting.
+        """
+        background = background_priority.get()
+        priority = "background" if background else "live"
+        waited = 0.0
+        while True:
+            wait = await self._reserve(routing, method, background)
+            if wait <= 0:
+                metrics.inc("rate_limit_budget_used_total", routing=routing, priority=priority)
+                if waited:
+                    metrics.observe("rate_limit_wait_seconds", waited, routing=routing, priority=priority)
+                return
+            waited += wait
+            if background:
+                await asyncio.sleep(wait)
+                continue
+            self.total_wait += wait
+            self._live_waiting[routing] = self._live_waiting.get(routing, 0) + 1
+            try:
+                await asyncio.sleep(wait)
+            finally:
+                self._live_waiting[routing] -= 1
+
+    @staticmethod
+    def _sync(windows: list[_Window], limits: list[tuple[int, int]], counts: list[tuple[int, int]]) -> list[_Window]:
+        """Reconcile local windows with the limits and counts reported by the server."""
+        if limits and [(w.limit, w.seconds) for w in windows] != limits:
+            old = {w.seconds: w for w in windows}
+            windows = [_Window(limit, seconds) for limit, seconds in limits]
+            for w in windows:
+                if w.seconds in old:
+                    w.count, w.reset_at = old[w.seconds].count, old[w.seconds].reset_at
+
+        now = time.monotonic()
+        server_counts = {seconds: count for count, seconds in counts}
+        for w in windows:
+            count = server_counts.get(w.seconds)
+            if count is None:
+                continue
+            if now >= w.reset_at:
+                w.reset_at = now + w.seconds
+                w.count = count
+            else:
+                w.count = max(w.count, count)
+        return windows
+
+    def update(self, routing: str, method: str, headers):
+        """Learn limits and current usage from a response's rate-limit headers."""
+        self._app_windows[routing] = self._sync(
+            self._app(routing),
+            parse_rate_limit_header(headers.get("X-App-Rate-Limit")),
+            parse_rate_limit_header(headers.get("X-App-Rate-Limit-Count")),
+        )
+        self._method_windows[(routing, method)] = self._sync(
+            self._method(routing, method),
+            parse_rate_limit_header(headers.get("X-Method-Rate-Limit")),
+            parse_rate_limit_header(headers.get("X-Method-Rate-Limit-Count")),
+        )
+
+    def penalize(self, routing: str, method: str, retry_after: float, limit_type: str | None = None):
+        """Block further requests after a 429 until Retry-After has elapsed."""
+        # An exceeded method limit only blocks that endpoint; application and service limits block the host.
+        key = f"{routing}:{method}" if limit_type == "method" else routing
+        until = time.monotonic() + retry_after
+        self._blocked_until[key] = max(self._blocked_until.get(key, 0.0), until)
+        metrics.inc("rate_limited_total", routing=routing, type=limit_type or "unknown")
+        self.logger.warning(f"Rate limit ({limit_type or 'unknown'}) hit on {key}, pausing {retry_after} seconds...")
+
+    async def record_response(self, routing: str, method: str, headers):
+        """Awaitable `update`, for limiters that persist it (SharedRateLimiter writes it off the event loop)."""
+        self.update(routing, method, headers)
+
+    async def record_rate_limited(self, routing: str, method: str, retry_after: float, limit_type: str | None = None):
+        """Awaitable `penalize`, see `record_response`."""
+        self.penalize(routing, method, retry_after, limit_type)
+
+    def close(self):
+        """Release the limiter's resources; the in-memory limiter has none."""
@@ -0,0 +1,122 @@
+import asyncio
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from PIL import Image
+from card_encoder import encode_stats
+from card_template import get_card_template
+from image_generator import render_lobby_image, render_summary_image
+from job_queue import QueueFull
+from config.image_constants import CARD_OUTPUT_FORMAT, RENDER_WORKERS, RENDER_MAX_QUEUE
+
+class RenderQueueFull(QueueFull):
+    pass
+
+def _image_payload(image: Image.Image | None):
+    """Turn a decoded image into picklable (mode, size, pixels) so workers skip decoding."""
+    if image is None:
+        return None
+    if image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGBA")
+    return image.mode, image.size, image.tobytes()
+
+def _render_worker(stats: dict, splash_payload, icon_payload, output_format: str):
+    """Runs in a worker process: render the card and return (data, extension, encode attempts, CPU seconds used)."""
+    start = time.thread_time()
+    splash = Image.frombytes(*splash_payload) if splash_payload else None
+    icon = Image.frombytes(*icon_payload) if icon_payload else None
+    data, extension, attempts = render_summary_image(stats, splash, icon, output_format)
+    return data, extension, attempts, time.thread_time() - start
+
+def _warm_worker():
+    """Runs in a worker process; starting it already ran the initializer, which loads fonts and the card template."""
+    return os.getpid()
+
+def _lobby_worker(players: list[tuple[dict, tuple | None]], output_format: str):
+    """Runs in a worker process: render the lobby grid; returns like _render_worker."""
+    start = time.thread_time()
+    players = [(stats, Image.frombytes(*payload) if payload else None) for stats, payload in players]
+    data, extension, attempts = render_lobby_image(players, output_format)
+    return data, extension, attempts, time.thread_time() - start
+
+class RenderExecutor:
+    """
+    Runs card rendering off the event loop in a pool of `workers` processes.
+    At most `max_queue` renders may be running or waiting; beyond that `render` raises RenderQueueFull.
+    With `workers=0` renders run in the default thread pool instead.
+    """
+    def __init__(self, workers: int = RENDER_WORKERS, max_queue: int = RENDER_MAX_QUEUE):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.pending = 0
+        self.renders = 0
+        self.total_wall_time = 0.0
+        self.total_cpu_time = 0.0
+        self.logger = logging.getLogger(__name__)
+        self._pool: ProcessPoolExecutor | None = None
+
+    def _executor(self) -> ProcessPoolExecutor | None:
+        if self.workers > 0 and self._pool is None:
+            # Each worker loads fonts and builds its card template once, before its first render
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=get_card_template)
+        return self._pool
+
+    async def _run(self, label: str, worker, *args) -> tuple[bytes, str]:
+        """Run `worker(*args)` in the pool, enforcing the queue limit and recording timings."""
+        if self.pending >= self.max_queue:
+            raise RenderQueueFull(f"Render queue is full ({self.max_queue} pending)")
+        self.pending += 1
+        start = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            data, extension, attempts, cpu_time = await loop.run_in_executor(self._executor(), worker, *args)
+        finally:
+            self.pending -= 1
+
+        wall_time = time.perf_counter() - start
+        self.renders += 1
+        self.total_wall_time += wall_time
+        self.total_cpu_time += cpu_time
+        encode_stats.record(attempts)
+        self.logger.info(
+            f"Rendered {label} in {wall_time * 1000:.0f} ms "
+            f"(cpu {cpu_time * 1000:.0f} ms, {extension} {len(data) / 1024:.0f} KB)"
+        )
+        return data, extension
+
+    async def render(self, stats: dict, splash: Image.Image | None, icon: Image.Image | None,
+                     output_format: str = CARD_OUTPUT_FORMAT) -> tuple[bytes, str]:
+        """Render a summary card from already-fetched assets; returns the encoded bytes and file extension."""
+        return await self._run(
+            f"card for {stats['name']}", _render_worker, stats, _image_payload(splash), _image_payload(icon), output_format
+        )
+
+    async def render_lobby(self, players: list[tuple[dict, Image.Image | None]],
+                           output_format: str = CARD_OUTPUT_FORMAT) -> tuple[bytes, str]:
+        """Render the lobby grid from (stats, icon) pairs; returns the encoded bytes and file extension."""
+        payload = [(stats, _image_payload(icon)) for stats, icon in players]
+        return await self._run(f"lobby card for {len(players)} players", _lobby_worker, payload, output_format)
+
+    async def warm_up(self):
+        """Start every worker now, so the first render doesn't wait for processes to spawn and load fonts."""
+        if self.workers == 0:
+            await asyncio.to_thread(get_card_template)
+            return
+        loop = asyncio.get_running_loop()
+        pool = self._executor()
+        await asyncio.gather(*(loop.run_in_executor(pool, _warm_worker) for _ in range(self.workers)))
+
+    def stats(self) -> dict[str, float]:
+        """Return render counters and average timings in milliseconds."""
+        return {
+            "renders": self.renders,
+            "pending": self.pending,
+            "avg_wall_ms": round(self.total_wall_time / self.renders * 1000, 2) if self.renders else 0,
+            "avg_cpu_ms": round(self.total_cpu_time / self.renders * 1000, 2) if self.renders else 0,
+        }
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
@@ -1,47 +1,195 @@
 import aiohttp
 import asyncio
 import logging
-from collections import Counter
+import random
+import time
+from urllib.parse import urlparse
 from config.API_constants import *
+from circuit_breaker import CircuitBreaker
+from match_cache import MatchCache
+from metrics import metrics
+from player_store import ParticipantRecord, PlayerState, PlayerStatsStore, compact_participant, participant_records, totals_of
+from rate_limiter import RateLimiter
+from single_flight import SingleFlight
+from ttl_cache import TTLCache
 
 class RiotAPIError(Exception):
     pass
 
+def parse_riot_ids(text: str, max_players: int) -> list[tuple[str, str]]:
+    """
+    Split "Name#Tag, Other Name#Tag2, ..." (commas or new lines) into (name, tag) pairs; the tag is
+    what follows the last "#". Raises ValueError for malformed IDs or more than `max_players`.
+    """
+    players = []
+    for part in text.replace("\n", ",").split(","):
+        part = part.strip()
+        if not part:
+            continue
+        name, _, tag = part.rpartition("#")
+        if not name.strip() or not tag.strip():
+            raise ValueError(f"`{part}` is not a Riot ID. Use `Name#Tag`, separated by commas.")
+        players.append((name.strip(), tag.strip()))
+    if not 1 <= len(players) <= max_players:
+        raise ValueError(f"Give between 1 and {max_players} Riot IDs, separated by commas.")
+    return players
+
+async def _as_async_iter(match_ids: list[str]):
+    for match_id in match_ids:
+        yield match_id
+
 class RiotAPIClient:
-    def __init__(self, api_key: str, rate_limit_timeout: int = DISCORD_RATE_LIMIT_TIMEOUT):
+    def __init__(self, api_key: str, rate_limit_timeout: int = DISCORD_RATE_LIMIT_TIMEOUT, match_cache: MatchCache | None = None, rate_limiter: RateLimiter | None = None, base_url: str = RIOT_API_URL):
         self.api_key = api_key
+        self.base_url = base_url  # "{routing}" is replaced by the platform/regional routing value
         self.rate_limit_timeout = rate_limit_timeout
+        self.match_cache = match_cache  # shared by every caller, None disables caching
+        self.rate_limiter = rate_limiter or RateLimiter()
+        self.player_store = PlayerStatsStore()
+        # Concurrent identical lookups share one in-flight request
+        self.account_flight = SingleFlight("account")
+        self.summoner_flight = SingleFlight("summoner")
+        self.match_flight = SingleFlight("match")
+        # Riot ID -> account and PUUID -> summoner, so warm lookups go straight to the match listing
+        self.account_cache = TTLCache("account", ACCOUNT_CACHE_TTL, LOOKUP_CACHE_MAX_ENTRIES)
+        self.summoner_cache = TTLCache("summoner", SUMMONER_CACHE_TTL, LOOKUP_CACHE_MAX_ENTRIES)
+        self.breakers: dict[str, CircuitBreaker] = {}  # routing value -> breaker for that host
         self.session: aiohttp.ClientSession | None = None
         self.logger = logging.getLogger(__name__)
 
     async def start(self):
-        """Initialize the persistent aiohttp session."""
+        """Initialize the persistent aiohttp session: bounded timeouts, a capped pool with DNS caching, gzip bodies."""
         if self.session is None or self.session.closed:
-            self.session = aiohttp.ClientSession()
+            self.session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=HTTP_POOL_LIMIT, limit_per_host=HTTP_POOL_LIMIT_PER_HOST,
+                    use_dns_cache=True, ttl_dns_cache=DNS_CACHE_TTL,
+                ),
+                timeout=aiohttp.ClientTimeout(
+                    total=HTTP_TOTAL_TIMEOUT, sock_connect=HTTP_CONNECT_TIMEOUT, sock_read=HTTP_READ_TIMEOUT,
+                ),
+                headers={"Accept-Encoding": "gzip"},
+            )
+
+    async def get_session(self) -> aiohttp.ClientSession:
+        """Return the pooled aiohttp session, starting it if needed (shared with the Data Dragon client)."""
+        await self.start()
+        return self.session
 
     async def close(self):
         """Close the aiohttp session gracefully."""
         if self.session and not self.session.closed:
             await self.session.close()
 
-    async def send_request(self, url: str, params: dict = None):
+    def api_url(self, routing: str, path: str) -> str:
+        """Full URL of `path` on the host for a routing value, e.g. ("europe", "/riot/account/v1/...")."""
+        return self.base_url.format(routing=routing) + path
+
+    def breaker(self, routing: str) -> CircuitBreaker:
+        if routing not in self.breakers:
+            self.breakers[routing] = CircuitBreaker(routing)
+        return self.breakers[routing]
+
+    @staticmethod
+    def backoff(attempt: int) -> float:
+        """Full-jitter exponential backoff before retry number `attempt` (1, 2, ...)."""
+        return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+
+    async def send_request(self, url: str, params: dict = None, method: str = None, routing: str = None):
+        """
+        GET a Riot API endpoint, scheduled by the rate limiter.
+        `method` names the endpoint for method rate limits; it defaults to the URL path.
+        `routing` is the routing value the limits apply to; it defaults to the first label of the host.
+        429s are retried after Retry-After, 5xx responses and timeouts/connection errors with
+        jittered exponential backoff, each at most a fixed number of times; hosts that keep failing
+        trip their circuit breaker and fail fast with CircuitOpenError until it lets a trial through.
+        """
         if not self.session or self.session.closed:
             await self.start()  # auto-start session if not already
 
+        routing = routing or urlparse(url).hostname.split(".")[0]  # e.g. "europe" or "euw1"
+        method = method or urlparse(url).path
         headers = {"X-Riot-Token": self.api_key}
-        async with self.session.get(url, headers=headers, params=params) as response:
-            if response.status == 200:  # BODY_JSON_RESPONSE = 200
-                return await response.json()
-            elif response.status == 429:  # RATE_LIMIT_EXCEEDED = 429
-                retry_after = int(response.headers.get("Retry-After", self.rate_limit_timeout))
-                self.logger.warning(f"Rate limit exceeded, waiting {retry_after} seconds...")
-                await asyncio.sleep(retry_after)
-                return await self.send_request(url, params)
-            else:
-                error_text = await response.text()
-                raise RiotAPIError(
-                    f"Riot API error {response.status} on {url} with params {params}: {error_text}"
-                )
+        breaker = self.breaker(routing)
+        rate_limited = server_errors = 0
+
+        while True:
+            breaker.check()
+            await self.rate_limiter.acquire(routing, method)
+            start = time.perf_counter()
+            try:
+                async with self.session.get(url, headers=headers, params=params) as response:
+                    await self.rate_limiter.record_response(routing, method, response.headers)
+                    metrics.inc("riot_requests_total", method=method, status=response.status)
+                    if response.status == BODY_JSON_RESPONSE:  # 200
+                        body = await response.json()
+                        breaker.record_success()
+                        metrics.observe("riot_request_seconds", time.perf_counter() - start, method=method)
+                        return body
+                    error_text = await response.text()
+                    if response.status == RATE_LIMIT_EXCEEDED:  # 429
+                        breaker.record_success()  # the host is up, we are just over budget
+                        retry_after = int(response.headers.get("Retry-After", self.rate_limit_timeout))
+                        await self.rate_limiter.record_rate_limited(routing, method, retry_after, response.headers.get("X-Rate-Limit-Type"))
+                        rate_limited += 1
+                        if rate_limited > RATE_LIMIT_MAX_RETRIES:
+                            raise RiotAPIError(f"Rate limit still exceeded on {url} after {RATE_LIMIT_MAX_RETRIES} retries")
+                        metrics.inc("riot_retries_total", method=method, reason="rate_limited")
+                        continue
+                    error = RiotAPIError(f"Riot API error {response.status} on {url} with params {params}: {error_text}")
+                    if response.status < 500:
+                        breaker.record_success()
+                        raise error
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                metrics.inc("riot_requests_total", method=method, status="error")
+                error = RiotAPIError(f"Request to {url} failed: {type(e).__name__} {e}")
+
+            # 5xx or transport failure: back off and retry, unless the host keeps failing
+            breaker.record_failure()
+            server_errors += 1
+            if server_errors > SERVER_ERROR_MAX_RETRIES:
+                raise error
+            delay = self.backoff(server_errors)
+            metrics.inc("riot_retries_total", method=method, reason="server_error")
+            self.logger.warning(f"{error}; retry {server_errors}/{SERVER_ERROR_MAX_RETRIES} in {delay:.2f} seconds")
+            await asyncio.sleep(delay)
+
+    def coalescing_stats(self) -> dict[str, dict[str, int]]:
+        """Per-level counts of started vs. coalesced requests."""
+        return {flight.name: flight.stats() for flight in (self.account_flight, self.summoner_flight, self.match_flight)}
+
+    def circuit_states(self) -> dict[str, str]:
+        return {routing: breaker.state for routing, breaker in self.breakers.items()}
+
+    def lookup_cache_stats(self) -> dict[str, dict[str, float]]:
+        return {cache.name: cache.stats() for cache in (self.account_cache, self.summoner_cache)}
+
+    async def _cached(self, cache: TTLCache, key, func, *args, refresh: bool = False, **kwargs):
+        """Return `cache[key]`, or await `func` and store its result (errors are not cached). `refresh` skips the cache read."""
+        value = None if refresh else cache.get(key)
+        if not refresh:
+            metrics.inc("lookup_cache_lookups_total", cache=cache.name, result="hit" if value is not None else "miss")
+        if value is None:
+            value = await func(*args, **kwargs)
+            cache.put(key, value)
+        return value
+
+    def estimated_cost(self, summoner_name: str, tag_line: str, region: str, match_count: int) -> int:
+        """
+        Rough number of match details a lookup still has to fetch: about 0 for a player whose
+        history we hold, `match_count` for one we know nothing about. Used to order queued lookups.
+        """
+        try:
+            _, regional = self.get_platform_and_regional(region)
+        except ValueError:
+            return match_count  # the lookup itself reports the unsupported region
+        account = self.account_cache.peek((regional, summoner_name.lower(), tag_line.lower()))
+        state = self.player_store.get(account["puuid"]) if account else None
+        if state is None:
+            return match_count
+        if state.exhausted:
+            return len(state.unfetched)
+        return len(state.unfetched) + max(0, min(match_count, PLAYER_STATE_MAX_MATCHES) - state.listed)
 
     def get_platform_and_regional(self, region: str):
         """Return platform and regional routing values for the given region."""
@@ -55,82 +203,214 @@ class RiotAPIClient:
     
     async def get_summoner_info(self, summoner_name: str, tag_line: str, region: str):
         _, regional = self.get_platform_and_regional(region)
-        url = f"https://{regional}.api.riotgames.com/riot/account/v1/accounts/by-riot-id/{summoner_name}/{tag_line}"
-        return await self.send_request(url)
+        url = self.api_url(regional, f"/riot/account/v1/accounts/by-riot-id/{summoner_name}/{tag_line}")
+        key = (regional, summoner_name.lower(), tag_line.lower())  # Riot IDs are case-insensitive
+        return await self._cached(
+            self.account_cache, key,
+            self.account_flight.do, key, self.send_request, url, method="account-v1.by-riot-id", routing=regional,
+        )
 
-    async def get_summoner_info_from_puuid(self, puuid: str, region: str):
+    async def get_summoner_info_from_puuid(self, puuid: str, region: str, refresh: bool = False):
         platform, _ = self.get_platform_and_regional(region)
-        url = f"https://{platform}.api.riotgames.com/lol/summoner/v4/summoners/by-puuid/{puuid}"
-        return await self.send_request(url)
+        url = self.api_url(platform, f"/lol/summoner/v4/summoners/by-puuid/{puuid}")
+        key = (platform, puuid)
+        return await self._cached(
+            self.summoner_cache, key,
+            self.summoner_flight.do, key, self.send_request, url, method="summoner-v4.by-puuid", routing=platform,
+            refresh=refresh,
+        )
 
     # Fetch recent match IDs for a given player only fetches RANKED SOLO/DUO
-    async def get_recent_match_ids(self, puuid: str, region: str, count: int = FETCHED_PARTICIPANT_MATCHES): 
+    # `start` skips the newest matches, `start_time` (epoch seconds) only returns games started since then
+    async def get_recent_match_ids(self, puuid: str, region: str, count: int = FETCHED_PARTICIPANT_MATCHES, start: int = 0, start_time: int | None = None):
         _, regional = self.get_platform_and_regional(region)
-        url = f"https://{regional}.api.riotgames.com/lol/match/v5/matches/by-puuid/{puuid}/ids"
+        url = self.api_url(regional, f"/lol/match/v5/matches/by-puuid/{puuid}/ids")
         params = {"count": count, "queue": RANKED_SOLO_DUO}
-        return await self.send_request(url, params)
+        if start:
+            params["start"] = start
+        if start_time is not None:
+            params["startTime"] = start_time
+        return await self.send_request(url, params, method="match-v5.ids-by-puuid", routing=regional)
 
     async def get_match_details(self, match_id: str, region: str):
+        return await self.match_flight.do(match_id, self._load_match_details, match_id, region)
+
+    async def _load_match_details(self, match_id: str, region: str):
+        if self.match_cache is not None:
+            cached = await asyncio.to_thread(self.match_cache.get, match_id)
+            metrics.inc("match_cache_lookups_total", result="hit" if cached is not None else "miss")
+            if cached is not None:
+                return cached
+
         _, regional = self.get_platform_and_regional(region)
-        url = f"https://{regional}.api.riotgames.com/lol/match/v5/matches/{match_id}"
-        return await self.send_request(url)
+        url = self.api_url(regional, f"/lol/match/v5/matches/{match_id}")
+        match_data = await self.send_request(url, method="match-v5.match", routing=regional)
 
-    async def fetch_participant_matches(self, puuid: str, region: str, match_count: int = FETCHED_PARTICIPANT_MATCHES, max_concurrent: int = SEMAPHORE_LIMIT):
+        if self.match_cache is not None:
+            await asyncio.to_thread(self.match_cache.put, match_id, match_data)
+        return match_data
+
+    async def iter_match_ids(self, puuid: str, region: str, total: int, start: int = 0, start_time: int | None = None):
+        """Yield up to `total` match IDs newest first, paging through match-v5 with `start`/`count`."""
+        fetched = 0
+        while fetched < total:
+            count = min(MATCH_IDS_PAGE_SIZE, total - fetched)
+            page = await self.get_recent_match_ids(puuid, region, count=count, start=start + fetched, start_time=start_time)
+            for match_id in page:
+                yield match_id
+            fetched += len(page)
+            if len(page) < count:
+                return  # no older games
+
+    async def stream_matches(self, match_ids, region: str, extract, on_result, progress=None, total: int | None = None) -> int:
         """
-        Return participant match data for the latest `match_count` matches.
-        Fetches match details concurrently, throttled by `max_concurrent` to avoid hitting rate limits.
+        Fetch the details of each match ID from the (async) iterable `match_ids` and pass
+        `extract(match_data)` to `on_result` as soon as it arrives (None results are skipped). At most
+        MATCH_STREAM_WINDOW fetches are in flight, so memory stays flat however long the history is;
+        the rate limiter decides how fast they start. `progress(done, total)` is awaited after each match.
+        Returns how many match IDs were consumed.
         """
-        matches = await self.get_recent_match_ids(puuid, region, count=match_count)
-        if not matches:
-            return []
-        semaphore = asyncio.Semaphore(max_concurrent)
-
         async def fetch_one(match_id):
-            async with semaphore:
-                try:
-                    match_data = await self.get_match_details(match_id, region)
-                    participant = next((p for p in match_data["info"]["participants"] if p["puuid"] == puuid), None)
-                    return participant
-                except Exception as e:
-                    print(f"Failed to fetch match {match_id}: {e}")
-                    return None
+            try:
+                return extract(await self.get_match_details(match_id, region))
+            except Exception as e:
+                # Skipped: the lookup goes on with the matches that did arrive
+                metrics.inc("match_fetch_failures_total", error=type(e).__name__)
+                self.logger.warning(f"Failed to fetch match {match_id}: {e}")
+                return None
 
-        results = await asyncio.gather(*(fetch_one(mid) for mid in matches))
+        pending = set()
+        consumed = done = 0
 
-        # Filter out None results
-        participant_matches = [p for p in results if p is not None]
+        async def drain(return_when):
+            nonlocal pending, done
+            finished, pending = await asyncio.wait(pending, return_when=return_when)
+            for task in finished:
+                done += 1
+                result = task.result()
+                if result is not None:
+                    on_result(result)
+                if progress is not None:
+                    await progress(done, total or consumed)
 
-        return participant_matches
+        try:
+            async for match_id in match_ids:
+                consumed += 1
+                pending.add(asyncio.create_task(fetch_one(match_id)))
+                if len(pending) >= MATCH_STREAM_WINDOW:
+                    await drain(asyncio.FIRST_COMPLETED)
+            while pending:
+                await drain(asyncio.FIRST_COMPLETED)
+        finally:
+            for task in pending:
+                task.cancel()  # the lookup was cancelled, stop its fetches too
+        return consumed
 
-    @staticmethod
-    def aggregate_match_stats(participant_matches: list[dict]) -> dict[str, float] | None:
-        """Aggregate stats from a list of participant dicts."""
-        if not participant_matches:
-            return None
+    async def stream_participants(self, match_ids, puuid: str, region: str, on_record, progress=None, total: int | None = None) -> int:
+        """stream_matches passing the compact participant record of `puuid` in each match to `on_record`."""
+        return await self.stream_matches(
+            match_ids, region, lambda match_data: compact_participant(match_data, puuid), on_record, progress, total
+        )
 
-        total = {
-            "wins": 0,
-            "kills": 0,
-            "deaths": 0,
-            "assists": 0,
-            "cs": 0,
-            "gold": 0,
-            "damage": 0,
-            "time_played": 0,
-        }
+    async def _stream_into(self, state: PlayerState, match_ids, puuid: str, region: str, progress=None, total: int | None = None) -> int:
+        """
+        Stream matches into `state`, merging records in small batches as they arrive. Listed matches
+        that failed to arrive, also because the lookup was cancelled, are marked unfetched in `state`.
+        """
+        batch = []
+        listed = []
+
+        async def listing():
+            async for match_id in match_ids:
+                listed.append(match_id)
+                yield match_id
+
+        def on_record(record):
+            batch.append(record)
+            if len(batch) >= MATCH_MERGE_BATCH:
+                state.merge(batch)
+                batch.clear()
+
+        try:
+            return await self.stream_participants(listing(), puuid, region, on_record, progress, total)
+        finally:
+            state.merge(batch)
+            state.mark_unfetched(listed)
+
+    async def _new_match_ids(self, puuid: str, region: str) -> tuple[PlayerState, list[str]]:
+        """
+        The stored state for `puuid` and the IDs to fetch: games started since its newest stored
+        match, then the ones an earlier update failed to fetch.
+        If there are too many new games to be sure there is no gap, the state is started over.
+        """
+        state = self.player_store.get_or_create(puuid)
+        metrics.inc("player_state_lookups_total", result="warm" if len(state) else "cold")
+        if state.newest_timestamp is None:
+            return state, list(state.unfetched)
+
+        known = set(state.match_ids) | state.unfetched
+        new_ids = [
+            mid async for mid in self.iter_match_ids(
+                puuid, region, PLAYER_STATE_MAX_MATCHES, start_time=state.newest_timestamp // 1000
+            )
+            if mid not in known
+        ]
+        if len(new_ids) >= PLAYER_STATE_MAX_MATCHES:
+            self.player_store.discard(puuid)
+            return self.player_store.get_or_create(puuid), []
+        return state, new_ids + list(state.unfetched)
+
+    async def update_player_state(self, puuid: str, region: str, match_count: int = FETCHED_PARTICIPANT_MATCHES, progress=None) -> PlayerState:
+        """
+        Bring the stored state for `puuid` up to date and make sure it covers `match_count` matches.
+        Known players only fetch games started since their newest stored match, plus older pages
+        (via `start`) if more matches are requested than we hold. Matches that fail to arrive are
+        retried by the next update.
+        """
+        state, new_ids = await self._new_match_ids(puuid, region)
+        if new_ids:
+            with metrics.span("match_fetch"):
+                await self._stream_into(state, _as_async_iter(new_ids), puuid, region, progress, len(new_ids))
 
-        for p in participant_matches:
-            if p["win"]:
-                total["wins"] += 1
-            total["kills"] += p["kills"]
-            total["deaths"] += p["deaths"]
-            total["assists"] += p["assists"]
-            total["cs"] += p.get("totalMinionsKilled", 0) + p.get("neutralMinionsKilled", 0)
-            total["time_played"] += p["timePlayed"]
-            total["gold"] += p["goldEarned"]
-            total["damage"] += p["totalDamageDealtToChampions"]
-
-        games = len(participant_matches)
+        missing = min(match_count, PLAYER_STATE_MAX_MATCHES) - state.listed
+        if missing > 0 and not state.exhausted:
+            older_ids = self.iter_match_ids(puuid, region, missing, start=state.listed)
+            with metrics.span("match_fetch"):
+                consumed = await self._stream_into(state, older_ids, puuid, region, progress, missing)
+            # Exhausted only once Riot listed fewer games than asked and every listed one was merged
+            state.exhausted = consumed < missing and not state.unfetched
+
+        return state
+
+    async def plan_player_update(self, puuid: str, region: str, match_count: int = FETCHED_PARTICIPANT_MATCHES) -> tuple[PlayerState, list[str], int, int]:
+        """
+        List what update_player_state would fetch without fetching it: returns the stored state,
+        the match IDs to fetch (new games, then older ones), and how many older IDs were wanted
+        and found (fewer found than wanted means the history is exhausted).
+        """
+        state, new_ids = await self._new_match_ids(puuid, region)
+        listed = len(state) + len(new_ids)  # new_ids includes the unfetched ones
+        missing = min(match_count, PLAYER_STATE_MAX_MATCHES) - listed
+        older_ids = []
+        if missing > 0 and not state.exhausted:
+            older_ids = [mid async for mid in self.iter_match_ids(puuid, region, missing, start=listed)]
+        return state, new_ids + older_ids, max(missing, 0), len(older_ids)
+
+    async def fetch_participant_matches(self, puuid: str, region: str, match_count: int = FETCHED_PARTICIPANT_MATCHES, progress=None) -> PlayerState:
+        """
+        Return the player's participant data for the latest `match_count` matches, newest first,
+        as a columnar PlayerState. Match details are fetched concurrently; the rate limiter
+        decides how many can start at once.
+        """
+        state = await self.update_player_state(puuid, region, match_count, progress)
+        return state.head(match_count)
+
+    @staticmethod
+    def summarize_totals(total: dict) -> dict[str, float] | None:
+        """Turn totals (see player_store.totals_from) into averages."""
+        games = total["games"]
+        if not games:
+            return None
         return {
             "winrate": round((total["wins"] / games) * 100, 2), # * 100 for percentage conversion
             "avg_kills": round(total["kills"] / games, 2),
@@ -144,38 +424,85 @@ class RiotAPIClient:
             "games": games,
         }
 
-    async def calculate_stats(self, summoner_name: str, tag_line: str, region: str, match_count: int = FETCHED_PARTICIPANT_MATCHES):
-        """Fetch summoner stats and return aggregated performance metrics."""
+    @staticmethod
+    def aggregate_match_stats(participant_matches: list[dict]) -> dict[str, float] | None:
+        """Aggregate stats from a list of match-v5 participant dicts."""
+        if not participant_matches:
+            return None
+        records = [ParticipantRecord("", 0, p) for p in participant_matches]
+        return RiotAPIClient.summarize_totals(totals_of(records))
+
+    @staticmethod
+    def featured_champions(totals: dict) -> tuple[str | None, int]:
+        """Most played champion and its game count; None if every champion was played only once."""
+        champion_counts = totals["champions"]
+        if not champion_counts:
+            return None, 0
+        most_played_champion, most_played_count = champion_counts.most_common(1)[0]
+        if most_played_count == 1 and len(champion_counts) > 1:
+            most_played_champion = None
+        return most_played_champion, most_played_count
+
+    async def _summoner_profile(self, puuid: str, region: str) -> tuple[int, int]:
+        with metrics.span("summoner"):
+            puuid_info = await self.get_summoner_info_from_puuid(puuid, region)
+        return puuid_info["profileIconId"], puuid_info["summonerLevel"]
+
+    async def _timed_player_state(self, puuid: str, region: str, match_count: int, progress=None) -> PlayerState:
+        with metrics.span("matches"):
+            return await self.update_player_state(puuid, region, match_count, progress)
+
+    async def calculate_stats(self, summoner_name: str, tag_line: str, region: str, match_count: int = FETCHED_PARTICIPANT_MATCHES, progress=None, prefetch=None):
+        """
+        Fetch summoner stats and return aggregated performance metrics.
+        `progress(done, total)` is awaited as match details arrive.
+        `prefetch(profile_icon_id=..., champion=..., player=puuid)` is called as soon as the icon ID or the likely
+        card champion is known, so card assets can download while the matches are still coming in.
+        Once the PUUID is known, the summoner-v4 call and the match history update run concurrently.
+        """
         try:
-            summoner_info = await self.get_summoner_info(summoner_name, tag_line, region)
+            with metrics.span("account"):
+                summoner_info = await self.get_summoner_info(summoner_name, tag_line, region)
         except RiotAPIError as e:
-            print(f"Riot API error: {e}")
+            self.logger.warning(f"Riot API error for {summoner_name}#{tag_line}: {e}")
             return None
         except Exception as e:
-            print(f"Unexpected error: {e}")
+            self.logger.warning(f"Unexpected error looking up {summoner_name}#{tag_line}: {e}")
             return None
+
+        puuid = summoner_info["puuid"]
+        known_state = self.player_store.get(puuid)
+        if prefetch is not None and known_state is not None and len(known_state):
+            # Stored games predict the card champion; a few new games rarely change it
+            most_played, _ = self.featured_champions(known_state.totals_for(match_count))
+            prefetch(champion=most_played or known_state.last_played_champion, player=puuid)
+
+        summoner_task = asyncio.create_task(self._summoner_profile(puuid, region))
+        state_task = asyncio.create_task(self._timed_player_state(puuid, region, match_count, progress))
         try:
-            puuid = summoner_info["puuid"]
-            puuid_info = await self.get_summoner_info_from_puuid(puuid, region)
-            profile_icon_id = puuid_info["profileIconId"]
-            profile_summoner_level = puuid_info["summonerLevel"]
+            profile_icon_id, profile_summoner_level = await summoner_task
         except Exception as e:
-            print(f"Error fetching summoner info: {e}")
+            state_task.cancel()
+            self.logger.warning(f"Error fetching summoner info for {summoner_name}#{tag_line}: {e}")
             return None
+        if prefetch is not None:
+            prefetch(profile_icon_id=profile_icon_id, player=puuid)
 
-        participant_matches = await self.fetch_participant_matches(puuid, region, match_count)
-        if not participant_matches:
+        state = await state_task
+        if not len(state):
             return None
 
-        stats = self.aggregate_match_stats(participant_matches)
-        last_played_champion = participant_matches[0]["championName"] if participant_matches else None
-        # Most played champion
-        champion_counts = Counter(p["championName"] for p in participant_matches)
-        most_played_champion, most_played_count = champion_counts.most_common(1)[0]
-        if most_played_count == 1 and len(champion_counts) > 1:
-            most_played_champion = None
+        return self.player_stats(summoner_name, tag_line, region, puuid, state, match_count, profile_icon_id, profile_summoner_level)
 
+    def player_stats(self, summoner_name: str, tag_line: str, region: str, puuid: str, state: PlayerState,
+                     match_count: int, profile_icon_id: int, profile_summoner_level: int) -> dict:
+        """The stats dict of calculate_stats, over the newest `match_count` matches of `state`."""
+        totals = state.totals_for(match_count)
+        stats = self.summarize_totals(totals)
+        last_played_champion = state.last_played_champion
+        most_played_champion, most_played_count = self.featured_champions(totals)
         return {
+            "puuid": puuid,
             "name": summoner_name,
             "region": region.upper(),
             "tag_line": tag_line,
@@ -192,4 +519,79 @@ class RiotAPIClient:
             "most_played_count": most_played_count,
             "profile_icon_id": profile_icon_id,
             "profile_summoner_level": profile_summoner_level,
-        }
\ No newline at end of file
+        }
+
+    async def calculate_lobby_stats(self, players: list[tuple[str, str]], region: str, match_count: int = FETCHED_PARTICIPANT_MATCHES, progress=None) -> list[dict | None]:
+        """
+        calculate_stats for several Riot IDs (summoner name, tag line) of one region at once.
+        Accounts and summoner profiles are resolved concurrently, then the match IDs every player
+        still needs are pooled: each match is fetched once for the whole lobby and every requested
+        participant is taken from that single payload, so duo partners' shared games cost one request.
+        Returns one stats dict per player, in order, with None for players that couldn't be looked up.
+        """
+        with metrics.span("account", command="lobby"):
+            accounts = await asyncio.gather(
+                *(self.get_summoner_info(name, tag, region) for name, tag in players), return_exceptions=True
+            )
+        puuids = {}  # puuid -> index of its first player, so a player listed twice is looked up once
+        for i, account in enumerate(accounts):
+            if isinstance(account, Exception):
+                self.logger.warning(f"Riot API error for {players[i][0]}#{players[i][1]}: {account}")
+            else:
+                puuids.setdefault(account["puuid"], i)
+
+        profiles_task = asyncio.gather(
+            *(self._summoner_profile(puuid, region) for puuid in puuids), return_exceptions=True
+        )
+        try:
+            planned = await asyncio.gather(
+                *(self.plan_player_update(puuid, region, match_count) for puuid in puuids), return_exceptions=True
+            )
+            plans = {}  # puuid -> plan, for players whose match history could be listed
+            for puuid, plan in zip(puuids, planned):
+                if isinstance(plan, Exception):
+                    self.logger.warning(f"Could not list matches of {puuid} for the lobby: {plan}")
+                else:
+                    plans[puuid] = plan
+
+            wanted: dict[str, set[str]] = {}  # match ID -> PUUIDs that need it, in first-seen order
+            for puuid, (_, match_ids, _, _) in plans.items():
+                for match_id in match_ids:
+                    wanted.setdefault(match_id, set()).add(puuid)
+            batches: dict[str, list[ParticipantRecord]] = {puuid: [] for puuid in plans}
+
+            def on_records(records: dict[str, ParticipantRecord]):
+                for puuid, record in records.items():
+                    batches[puuid].append(record)
+
+            with metrics.span("match_fetch", command="lobby"):
+                await self.stream_matches(
+                    _as_async_iter(list(wanted)), region,
+                    lambda match_data: participant_records(match_data, wanted[match_data["metadata"]["matchId"]]),
+                    on_records, progress, len(wanted),
+                )
+            metrics.inc("lobby_matches_total", value=sum(len(ids) for _, ids, _, _ in plans.values()), result="requested")
+            metrics.inc("lobby_matches_total", value=len(wanted), result="fetched")
+
+            for puuid, (state, match_ids, older_wanted, older_found) in plans.items():
+                state.merge(batches[puuid])
+                state.mark_unfetched(match_ids)  # failed fetches are retried by the player's next update
+                if older_wanted:
+                    state.exhausted = older_found < older_wanted and not state.unfetched
+
+            profiles = dict(zip(puuids, await profiles_task))
+        finally:
+            profiles_task.cancel()  # no-op once awaited; stops the profile lookups if the lobby failed or was cancelled
+        results = []
+        for i, (name, tag) in enumerate(players):
+            account = accounts[i]
+            if isinstance(account, Exception) or account["puuid"] not in plans:
+                results.append(None)
+                continue
+            puuid = account["puuid"]
+            state, profile = plans[puuid][0], profiles[puuid]
+            if isinstance(profile, Exception) or not len(state):
+                results.append(None)
+                continue
+            results.append(self.player_stats(name, tag, region, puuid, state, match_count, *profile))
+        return results
@@ -0,0 +1,142 @@
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from config.API_constants import DEFAULT_APP_RATE_LIMIT, RATE_LIMIT_LEDGER_BUSY_TIMEOUT, RATE_LIMIT_LEDGER_MAX_BLOCK, RATE_LIMIT_LEDGER_PATH, RATE_LIMIT_LEDGER_RETRY
+from metrics import metrics
+from rate_limiter import RateLimiter, _Window
+
+def _to_wall(monotonic_time: float) -> float:
+    return monotonic_time - time.monotonic() + time.time()
+
+def _to_monotonic(wall_time: float) -> float:
+    return wall_time - time.time() + time.monotonic()
+
+class SharedRateLimiter(RateLimiter):
+    """
+    RateLimiter whose windows and 429 blocks live in a SQLite ledger, so every bot process on the
+    machine that uses the same Riot API key draws from one budget instead of each assuming it has
+    all of it. Each check-and-count runs in one IMMEDIATE transaction: the ledger rows for the
+    routing value and endpoint are loaded into the in-memory windows, the usual RateLimiter logic
+    runs on them, and the result is written back before the next process can look.
+    The ledger stores wall-clock times, converted from and to the time.monotonic() values the
+    windows use in memory; rows lying implausibly far in the future (the clock was set back) are
+    ignored. If the ledger stays locked beyond RATE_LIMIT_LEDGER_BUSY_TIMEOUT, a request waits
+    RATE_LIMIT_LEDGER_RETRY and tries again instead of failing.
+    """
+    def __init__(self, path: str = RATE_LIMIT_LEDGER_PATH, default_app_limit: str = DEFAULT_APP_RATE_LIMIT):
+        super().__init__(default_app_limit)
+        self.path = path
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # Used from worker threads via asyncio.to_thread, guarded by self._lock; transactions are explicit.
+        self._conn = sqlite3.connect(path, timeout=RATE_LIMIT_LEDGER_BUSY_TIMEOUT, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS windows ("
+            "key TEXT NOT NULL, "
+            "seconds INTEGER NOT NULL, "
+            "amount INTEGER NOT NULL, "
+            "count INTEGER NOT NULL, "
+            "reset_at REAL NOT NULL, "
+            "PRIMARY KEY (key, seconds))"
+        )
+        self._conn.execute("CREATE TABLE IF NOT EXISTS blocks (key TEXT PRIMARY KEY, until REAL NOT NULL)")
+
+    def _load_windows(self, key: str) -> list[_Window] | None:
+        rows = self._conn.execute(
+            "SELECT amount, seconds, count, reset_at FROM windows WHERE key = ? ORDER BY seconds", (key,)
+        ).fetchall()
+        if not rows:
+            return None
+        now = time.time()
+        windows = []
+        for amount, seconds, count, reset_at in rows:
+            window = _Window(amount, seconds)
+            if reset_at - now <= seconds:  # otherwise written before the clock was set back
+                window.count, window.reset_at = count, _to_monotonic(reset_at)
+            windows.append(window)
+        return windows
+
+    def _store_windows(self, key: str, windows: list[_Window]):
+        self._conn.execute("DELETE FROM windows WHERE key = ?", (key,))
+        self._conn.executemany(
+            "INSERT INTO windows (key, seconds, amount, count, reset_at) VALUES (?, ?, ?, ?, ?)",
+            [(key, w.seconds, w.limit, w.count, _to_wall(w.reset_at)) for w in windows],
+        )
+
+    @contextmanager
+    def _transaction(self, routing: str, method: str):
+        """Load the ledger state for `routing`/`method` into memory, and write it back when the block exits."""
+        method_key = f"{routing}:{method}"
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                app = self._load_windows(routing)
+                if app is not None:
+                    self._app_windows[routing] = app
+                self._method_windows[(routing, method)] = self._load_windows(method_key) or []
+                now = time.time()
+                for key in (routing, method_key):
+                    row = self._conn.execute("SELECT until FROM blocks WHERE key = ?", (key,)).fetchone()
+                    if row is not None and row[0] - now <= RATE_LIMIT_LEDGER_MAX_BLOCK:
+                        # Keep a block this process recorded while the ledger was locked
+                        self._blocked_until[key] = max(self._blocked_until.get(key, 0.0), _to_monotonic(row[0]))
+
+                yield
+
+                self._store_windows(routing, self._app(routing))
+                self._store_windows(method_key, self._method(routing, method))
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO blocks (key, until) VALUES (?, ?)",
+                    [(key, _to_wall(self._blocked_until[key])) for key in (routing, method_key) if self._blocked_until.get(key)],
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def _try_consume_shared(self, routing: str, method: str, background: bool) -> float:
+        with self._transaction(routing, method):
+            return self._try_consume(routing, method, background)
+
+    async def _reserve(self, routing: str, method: str, background: bool) -> float:
+        try:
+            return await asyncio.to_thread(self._try_consume_shared, routing, method, background)
+        except sqlite3.OperationalError as e:  # "database is locked": another process held the ledger too long
+            metrics.inc("rate_limit_ledger_errors_total", operation="acquire")
+            self.logger.debug(f"Rate-limit ledger unavailable, retrying: {e}")
+            return RATE_LIMIT_LEDGER_RETRY
+
+    def update(self, routing: str, method: str, headers):
+        with self._transaction(routing, method):
+            super().update(routing, method, headers)
+
+    def penalize(self, routing: str, method: str, retry_after: float, limit_type: str | None = None):
+        with self._transaction(routing, method):
+            super().penalize(routing, method, retry_after, limit_type)
+
+    async def record_response(self, routing: str, method: str, headers):
+        # The ledger transaction may wait up to RATE_LIMIT_LEDGER_BUSY_TIMEOUT on other processes
+        try:
+            await asyncio.to_thread(self.update, routing, method, headers)
+        except sqlite3.OperationalError as e:
+            # The next acquire reloads the counts from the ledger, and Riot reports them again with the next response
+            metrics.inc("rate_limit_ledger_errors_total", operation="update")
+            self.logger.debug(f"Rate-limit ledger unavailable, skipping header update: {e}")
+
+    async def record_rate_limited(self, routing: str, method: str, retry_after: float, limit_type: str | None = None):
+        try:
+            await asyncio.to_thread(self.penalize, routing, method, retry_after, limit_type)
+        except sqlite3.OperationalError as e:
+            # At least this process backs off; the block is written to the ledger with its next transaction
+            metrics.inc("rate_limit_ledger_errors_total", operation="penalize")
+            self.logger.warning(f"Rate-limit ledger unavailable, keeping the 429 block in this process only: {e}")
+            RateLimiter.penalize(self, routing, method, retry_after, limit_type)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,58 @@
+import asyncio
+from collections.abc import Awaitable, Callable, Hashable
+from rate_limiter import background_priority
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls for the same key: the first caller starts the work as a task,
+    later callers await that same task instead of starting their own.
+    The task is shielded, so one caller being cancelled doesn't cancel it for the others;
+    it is only cancelled once every caller waiting on it has been cancelled.
+    Work started with background priority (see rate_limiter.background_priority) is only joined by
+    other background callers: a live caller would otherwise wait behind the background budget, so
+    it starts its own live task, which later background callers join instead.
+    """
+    def __init__(self, name: str):
+        self.name = name
+        self.calls = 0       # calls that started new work
+        self.coalesced = 0   # calls that joined work already in flight
+        self._inflight: dict[tuple[Hashable, bool], asyncio.Task] = {}  # (key, background) -> task
+        self._waiters: dict[asyncio.Task, int] = {}  # in-flight task -> callers awaiting it
+
+    async def do(self, key: Hashable, func: Callable[..., Awaitable], *args, **kwargs):
+        background = background_priority.get()
+        flight_key = (key, False)
+        task = self._inflight.get(flight_key)
+        if task is None and background:
+            flight_key = (key, True)
+            task = self._inflight.get(flight_key)
+        if task is None:
+            self.calls += 1
+            task = asyncio.ensure_future(func(*args, **kwargs))  # runs with the caller's priority
+            self._inflight[flight_key] = task
+            task.add_done_callback(lambda t: self._forget(flight_key, t))
+        else:
+            self.coalesced += 1
+        self._waiters[task] = self._waiters.get(task, 0) + 1
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if not task.done() and self._waiters.get(task) == 1:
+                # Nobody is left waiting for the result; new callers start fresh work instead of joining it
+                if self._inflight.get(flight_key) is task:
+                    del self._inflight[flight_key]
+                task.cancel()
+            raise
+        finally:
+            if task in self._waiters:
+                self._waiters[task] -= 1
+
+    def _forget(self, key: tuple[Hashable, bool], task: asyncio.Task):
+        self._waiters.pop(task, None)
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()  # mark retrieved even if every caller went away
+
+    def stats(self) -> dict[str, int]:
+        return {"calls": self.calls, "coalesced": self.coalesced, "in_flight": len(self._inflight)}
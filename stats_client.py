@@ -0,0 +1,69 @@
+import io
+import aiohttp
+from urllib.parse import quote, unquote
+from job_queue import QueueFull
+from ttl_cache import TTLCache
+from config.service_constants import SERVICE_CLIENT_CACHE_MAX_ENTRIES, SERVICE_CLIENT_CACHE_TTL, SERVICE_CLIENT_TIMEOUT
+
+class StatsServiceError(Exception):
+    pass
+
+class StatsServiceClient:
+    """
+    The bot's side of stats_service.py: fetches rendered cards over HTTP instead of looking players
+    up in-process. Recent cards are kept with their ETag and re-requested conditionally, so an
+    unchanged card costs a 304 instead of a download. A 503 from the service raises QueueFull.
+    """
+    def __init__(self, base_url: str, token: str | None = None):
+        self.base_url = base_url.rstrip("/")
+        self.headers = {"Authorization": f"Bearer {token}"} if token else {}
+        self.session: aiohttp.ClientSession | None = None
+        self._cards = TTLCache("service_card", SERVICE_CLIENT_CACHE_TTL, SERVICE_CLIENT_CACHE_MAX_ENTRIES)  # url -> (etag, data, filename, missing)
+
+    async def start(self):
+        if self.session is None or self.session.closed:
+            self.session = aiohttp.ClientSession(
+                headers=self.headers, timeout=aiohttp.ClientTimeout(total=SERVICE_CLIENT_TIMEOUT)
+            )
+
+    async def close(self):
+        if self.session and not self.session.closed:
+            await self.session.close()
+
+    async def _get_image(self, path: str, params: dict):
+        """GET an image, revalidating a cached copy; returns (data, filename, missing players) or Nones on 404."""
+        await self.start()
+        url = self.base_url + path
+        key = (url, tuple(sorted(params.items())))
+        cached = self._cards.get(key)
+        headers = {"If-None-Match": cached[0]} if cached else {}
+        async with self.session.get(url, params=params, headers=headers) as response:
+            if response.status == 304 and cached:
+                return cached[1:]
+            if response.status == 404:
+                return None, None, []
+            if response.status == 503:
+                raise QueueFull(await response.text())
+            if response.status != 200:
+                raise StatsServiceError(f"Stats service returned {response.status}: {await response.text()}")
+            data = await response.read()
+            filename = response.content_disposition.filename if response.content_disposition else "card.png"
+            missing_header = response.headers.get("X-Missing-Players", "")
+            missing = [unquote(riot_id) for riot_id in missing_header.split(",") if riot_id]
+            if "ETag" in response.headers:
+                self._cards.put(key, (response.headers["ETag"], data, filename, missing))
+            return data, filename, missing
+
+    async def summary_card(self, summoner_name: str, tag_line: str, region: str, match_count: int):
+        """Return (card bytes, file name), or (None, None) if the player has no stats."""
+        path = f"/card/{quote(region, safe='')}/{quote(summoner_name, safe='')}/{quote(tag_line, safe='')}"
+        data, filename, _ = await self._get_image(path, {"match_count": match_count})
+        return data, filename
+
+    async def lobby_card(self, riot_ids: list[tuple[str, str]], region: str):
+        """Return (Riot IDs without stats, card as BytesIO, file name); the card is None if nobody was found."""
+        players = ",".join(f"{name}#{tag}" for name, tag in riot_ids)
+        data, filename, missing = await self._get_image(f"/lobby/{quote(region, safe='')}", {"players": players})
+        if data is None:
+            return [f"{name}#{tag}" for name, tag in riot_ids], None, None
+        return missing, io.BytesIO(data), filename
@@ -0,0 +1,220 @@
+"""
+HTTP stats/render service: the Riot lookups and card rendering of the bot, served as JSON and images
+so they can run (and scale out) apart from the Discord gateway. Run with `python stats_service.py`
+or `uvicorn stats_service:app --host ... --port ... --workers N` (then set SHARED_RATE_LIMIT so the
+workers share one rate-limit budget); point the bot at it with STATS_SERVICE_URL.
+
+    GET /stats/{region}/{name}/{tag}?match_count=25        -> stats JSON
+    GET /card/{region}/{name}/{tag}?match_count=25&format= -> summary card image
+    GET /lobby/{region}?players=Name%23Tag,Name%23Tag      -> lobby card image (X-Missing-Players header)
+
+Responses carry an ETag and Cache-Control max-age; a request whose If-None-Match matches gets 304.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+from contextlib import asynccontextmanager
+from typing import Literal
+from urllib.parse import quote
+from dotenv import load_dotenv
+from fastapi import Depends, FastAPI, HTTPException, Query, Request, Response
+from riot_api import RiotAPIClient, parse_riot_ids
+from rate_limiter import RateLimiter
+from shared_rate_limiter import SharedRateLimiter
+from match_cache import MatchCache
+from render_pool import RenderExecutor
+from single_flight import SingleFlight
+from job_queue import JobQueue, QueueFull
+from ttl_cache import TTLCache
+from card_encoder import ENCODERS
+from image_generator import AssetPrefetcher, asset_cache, card_cache, generate_lobby_image, generate_summary_image
+from metrics import metrics
+from watchlist import Watchlist
+from config.bot_constants import DEFAULT_MATCH_COUNT, LOBBY_MATCH_COUNT, LOBBY_MAX_PLAYERS, MAX_MATCH_COUNT, SHARED_RATE_LIMIT, VALID_REGIONS, WATCHLIST_ENABLED
+from config.service_constants import *
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+RIOT_API_KEY = os.getenv("RIOT_API_KEY")
+SERVICE_TOKEN = os.getenv("STATS_SERVICE_TOKEN")
+# With several workers or instances, set RUN_WATCHLIST=0 on all but one so the watchlist is refreshed once
+RUN_WATCHLIST = os.getenv("RUN_WATCHLIST", "1") != "0"
+
+# ----------------- Riot API and rendering -----------------
+match_cache = MatchCache()
+rate_limiter = SharedRateLimiter() if SHARED_RATE_LIMIT or SERVICE_WORKERS > 1 else RateLimiter()
+riot_api_client = RiotAPIClient(RIOT_API_KEY, match_cache=match_cache, rate_limiter=rate_limiter)
+watchlist = Watchlist(riot_api_client)
+render_executor = RenderExecutor()
+lookup_queue = JobQueue("service_lookup")
+lookup_flight = SingleFlight("service_lookup")  # identical concurrent requests share one lookup
+etags = TTLCache("etag", SERVICE_MAX_AGE, SERVICE_ETAG_CACHE_MAX_ENTRIES)  # request key -> ETag of its last response
+
+metrics.register_collector(lambda: {f"match_cache_{k}": v for k, v in match_cache.stats().items()})
+metrics.register_collector(lambda: {f"asset_cache_{k}": v for k, v in asset_cache.stats().items()})
+metrics.register_collector(lambda: {f"card_cache_{k}": v for k, v in card_cache.stats().items()})
+metrics.register_collector(lambda: {f"render_{k}": v for k, v in render_executor.stats().items()})
+metrics.register_collector(lambda: {f"lookup_queue_{k}": v for k, v in lookup_queue.stats().items()})
+metrics.register_collector(lambda: {f"etag_cache_{k}": v for k, v in etags.stats().items()})
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if not RIOT_API_KEY:
+        raise ValueError("Missing RIOT_API_KEY.")
+    await riot_api_client.start()
+    watchlist_task = asyncio.create_task(watchlist.run()) if WATCHLIST_ENABLED and RUN_WATCHLIST else None
+    yield
+    if watchlist_task is not None:
+        watchlist_task.cancel()
+    await riot_api_client.close()
+    match_cache.close()
+    rate_limiter.close()
+    watchlist.close()
+    render_executor.shutdown()
+
+async def check_token(request: Request):
+    if SERVICE_TOKEN and request.headers.get("authorization") != f"Bearer {SERVICE_TOKEN}":
+        raise HTTPException(status_code=401, detail="Missing or wrong bearer token.")
+
+app = FastAPI(title="OracleLens stats service", lifespan=lifespan, dependencies=[Depends(check_token)])
+
+# ----------------- Helpers -----------------
+def validate_region(region: str) -> str:
+    if region.lower() not in VALID_REGIONS:
+        raise HTTPException(status_code=400, detail=f"Invalid region. Must be one of: {', '.join(VALID_REGIONS)}")
+    return region.lower()
+
+def etag_for(data: bytes) -> str:
+    return '"' + hashlib.blake2b(data, digest_size=16).hexdigest() + '"'
+
+def etag_matches(request: Request, etag: str | None) -> bool:
+    if etag is None:
+        return False
+    tags = [tag.strip().removeprefix("W/") for tag in request.headers.get("if-none-match", "").split(",")]
+    return etag in tags or "*" in tags
+
+def not_modified(etag: str) -> Response:
+    metrics.inc("service_responses_total", result="not_modified")
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": f"max-age={SERVICE_MAX_AGE}"})
+
+def cached_response(request: Request, key: tuple, data: bytes, media_type: str, headers: dict | None = None) -> Response:
+    """Answer with `data` (or 304 if the client already has it), remembering its ETag for SERVICE_MAX_AGE."""
+    etag = etag_for(data)
+    etags.put(key, etag)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    metrics.inc("service_responses_total", result="ok")
+    return Response(data, media_type=media_type, headers={
+        "ETag": etag, "Cache-Control": f"max-age={SERVICE_MAX_AGE}", **(headers or {}),
+    })
+
+async def run_lookup(key: tuple, cost: int, func, *args):
+    """Run func(*args) through the lookup queue, shared by identical requests; maps overload to 503."""
+    try:
+        return await asyncio.wait_for(lookup_flight.do(key, lookup_queue.submit, cost, func, *args), SERVICE_JOB_TIMEOUT)
+    except QueueFull:  # lookup or render queue
+        raise HTTPException(status_code=503, detail="Too many lookups queued, try again later.", headers={"Retry-After": "30"})
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="The lookup took too long and was cancelled.")
+
+# File extension -> media type; the extension isn't always the subtype (jpg -> image/jpeg)
+MEDIA_TYPES = {extension: f"image/{name}" for name, (_, extension, _) in ENCODERS.items()}
+
+def media_type(filename: str) -> str:
+    return MEDIA_TYPES[filename.rsplit(".", 1)[-1]]
+
+async def lookup_stats(summoner_name, tag_line, region, match_count):
+    stats = await riot_api_client.calculate_stats(summoner_name, tag_line, region, match_count)
+    if stats:
+        await watchlist.record_lookup(stats["puuid"], region, f"{summoner_name}#{tag_line}")
+    return stats
+
+async def lookup_card(summoner_name, tag_line, region, match_count, output_format):
+    prefetcher = AssetPrefetcher(await riot_api_client.get_session())
+    stats = await riot_api_client.calculate_stats(summoner_name, tag_line, region, match_count, prefetch=prefetcher)
+    if not stats:
+        return None, None
+    await watchlist.record_lookup(stats["puuid"], region, f"{summoner_name}#{tag_line}")
+    file_obj, filename = await generate_summary_image(prefetcher.session, stats, render_executor, output_format, prefetcher)
+    return file_obj.getvalue(), filename
+
+async def lookup_lobby(riot_ids, region, output_format):
+    results = await riot_api_client.calculate_lobby_stats(riot_ids, region, LOBBY_MATCH_COUNT)
+    missing = [f"{name}#{tag}" for (name, tag), stats in zip(riot_ids, results) if not stats]
+    found = [stats for stats in results if stats]
+    if not found:
+        return missing, None, None
+    file_obj, filename = await generate_lobby_image(await riot_api_client.get_session(), found, render_executor, output_format)
+    return missing, file_obj.getvalue(), filename
+
+# ----------------- Endpoints -----------------
+OutputFormat = Literal["auto", "webp", "jpeg", "png"]
+
+@app.get("/stats/{region}/{summoner_name}/{tag_line}")
+async def stats(request: Request, region: str, summoner_name: str, tag_line: str,
+                match_count: int = Query(DEFAULT_MATCH_COUNT, ge=1, le=MAX_MATCH_COUNT)):
+    """calculate_stats as JSON."""
+    region = validate_region(region)
+    tag_line = tag_line.lstrip("#")
+    key = ("stats", summoner_name.lower(), tag_line.lower(), region, match_count)
+    if etag_matches(request, etags.get(key)):
+        return not_modified(etags.get(key))
+    cost = riot_api_client.estimated_cost(summoner_name, tag_line, region, match_count)
+    result = await run_lookup(key, cost, lookup_stats, summoner_name, tag_line, region, match_count)
+    if not result:
+        raise HTTPException(status_code=404, detail="No stats found. Check the summoner name, tag line and region.")
+    body = json.dumps(result, sort_keys=True).encode("utf-8")
+    return cached_response(request, key, body, "application/json")
+
+@app.get("/card/{region}/{summoner_name}/{tag_line}")
+async def card(request: Request, region: str, summoner_name: str, tag_line: str,
+               match_count: int = Query(DEFAULT_MATCH_COUNT, ge=1, le=MAX_MATCH_COUNT),
+               output_format: OutputFormat = Query("auto", alias="format")):
+    """The summary card as an image."""
+    region = validate_region(region)
+    tag_line = tag_line.lstrip("#")
+    key = ("card", summoner_name.lower(), tag_line.lower(), region, match_count, output_format)
+    if etag_matches(request, etags.get(key)):
+        return not_modified(etags.get(key))
+    cost = riot_api_client.estimated_cost(summoner_name, tag_line, region, match_count)
+    data, filename = await run_lookup(key, cost, lookup_card, summoner_name, tag_line, region, match_count, output_format)
+    if data is None:
+        raise HTTPException(status_code=404, detail="No stats found. Check the summoner name, tag line and region.")
+    return cached_response(request, key, data, media_type(filename), {"Content-Disposition": f'inline; filename="{filename}"'})
+
+@app.get("/lobby/{region}")
+async def lobby(request: Request, region: str, players: str, output_format: OutputFormat = Query("auto", alias="format")):
+    """The lobby card for comma-separated Riot IDs (Name#Tag) as an image; unknown players are listed in X-Missing-Players."""
+    region = validate_region(region)
+    try:
+        riot_ids = parse_riot_ids(players, LOBBY_MAX_PLAYERS)  # the same parsing as the bot's !lobbystats
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    key = ("lobby", tuple((name.lower(), tag.lower()) for name, tag in riot_ids), region, output_format)
+    if etag_matches(request, etags.get(key)):
+        return not_modified(etags.get(key))
+    cost = sum(riot_api_client.estimated_cost(name, tag, region, LOBBY_MATCH_COUNT) for name, tag in riot_ids)
+    missing, data, filename = await run_lookup(key, cost, lookup_lobby, riot_ids, region, output_format)
+    if data is None:
+        raise HTTPException(status_code=404, detail="No stats found for any player. Check the Riot IDs and region.")
+    return cached_response(request, key, data, media_type(filename), {
+        "Content-Disposition": f'inline; filename="{filename}"',
+        "X-Missing-Players": ",".join(quote(riot_id) for riot_id in missing),
+    })
+
+@app.get("/healthz")
+async def healthz():
+    return {"status": "ok", "queue": lookup_queue.stats(), "circuits": riot_api_client.circuit_states()}
+
+@app.get("/metrics")
+async def prometheus():
+    return Response(metrics.render_prometheus(), media_type="text/plain; charset=utf-8")
+
+if __name__ == "__main__":  # render worker processes re-import this module
+    import uvicorn
+    uvicorn.run("stats_service:app", host=SERVICE_HOST, port=SERVICE_PORT, workers=SERVICE_WORKERS)
@@ -0,0 +1,117 @@
+import asyncio
+import pytest
+from job_queue import JobQueue, QueueFull
+
+async def until_idle(queue: JobQueue):
+    while queue.running or queue.stats()["waiting"]:
+        await asyncio.sleep(0.001)
+
+def test_waiting_jobs_start_cheapest_first():
+    async def scenario():
+        queue = JobQueue("test", workers=1, max_depth=10)
+        gate = asyncio.Event()
+        order = []
+
+        async def job(name):
+            if name == "blocker":
+                await gate.wait()
+            order.append(name)
+
+        tasks = [asyncio.create_task(queue.submit(0, job, "blocker"))]
+        await asyncio.sleep(0)
+        for cost, name in [(30, "expensive"), (1, "cheap"), (10, "medium")]:
+            tasks.append(asyncio.create_task(queue.submit(cost, job, name)))
+        await asyncio.sleep(0)
+        gate.set()
+        await asyncio.gather(*tasks)
+        assert order == ["blocker", "cheap", "medium", "expensive"]
+
+    asyncio.run(scenario())
+
+def test_submit_raises_queue_full_beyond_max_depth():
+    async def scenario():
+        queue = JobQueue("test", workers=1, max_depth=1)
+        gate = asyncio.Event()
+        running = asyncio.create_task(queue.submit(0, gate.wait))
+        waiting = asyncio.create_task(queue.submit(0, gate.wait))
+        await asyncio.sleep(0)
+        with pytest.raises(QueueFull):
+            await queue.submit(0, gate.wait)
+        assert queue.stats()["rejected"] == 1
+        gate.set()
+        await asyncio.gather(running, waiting)
+
+    asyncio.run(scenario())
+
+def test_cancelled_waiting_job_never_runs():
+    async def scenario():
+        queue = JobQueue("test", workers=1, max_depth=10)
+        gate = asyncio.Event()
+        ran = []
+
+        async def job(name):
+            ran.append(name)
+
+        blocker = asyncio.create_task(queue.submit(0, gate.wait))
+        waiting = asyncio.create_task(queue.submit(1, job, "cancelled"))
+        await asyncio.sleep(0)
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+        assert queue.stats()["waiting"] == 0
+        gate.set()
+        await blocker
+        await until_idle(queue)
+        assert ran == []
+        assert queue.stats()["cancelled"] == 1
+
+    asyncio.run(scenario())
+
+def test_caller_cancelled_during_first_position_update_leaves_the_queue():
+    async def scenario():
+        queue = JobQueue("test", workers=1, max_depth=10)
+        gate = asyncio.Event()
+        ran = []
+
+        async def job():
+            ran.append(True)
+
+        async def slow_position_update(position, eta):
+            await asyncio.sleep(10)  # e.g. a Discord message edit stuck behind a rate limit
+
+        blocker = asyncio.create_task(queue.submit(0, gate.wait))
+        await asyncio.sleep(0)
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(queue.submit(1, job, on_position=slow_position_update), 0.01)
+        assert queue.stats()["waiting"] == 0
+        gate.set()
+        await blocker
+        await until_idle(queue)
+        assert ran == []
+
+    asyncio.run(scenario())
+
+def test_cancelling_a_running_job_cancels_its_work():
+    async def scenario():
+        queue = JobQueue("test", workers=1, max_depth=10)
+        started = asyncio.Event()
+        cancelled = []
+
+        async def job():
+            started.set()
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.append(True)
+                raise
+
+        task = asyncio.create_task(queue.submit(0, job))
+        await started.wait()
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        await until_idle(queue)
+        assert cancelled == [True]
+        assert queue.stats()["running"] == 0
+
+    asyncio.run(scenario())
@@ -0,0 +1,114 @@
+import asyncio
+from player_store import ParticipantRecord, PlayerState, totals_of
+from riot_api import RiotAPIClient
+
+def record(number: int, kills: int = 1, champion: str = "Ahri", win: bool = True) -> ParticipantRecord:
+    """Match EUW1_<number>, started `number` minutes after the epoch (higher numbers are newer)."""
+    return ParticipantRecord(f"EUW1_{number}", number * 60_000, {
+        "championName": champion, "win": win, "kills": kills, "deaths": 2, "assists": 3,
+        "totalMinionsKilled": 100, "neutralMinionsKilled": 10, "goldEarned": 9000,
+        "totalDamageDealtToChampions": 15000, "timePlayed": 1800,
+    })
+
+def test_merge_orders_newest_first_and_keeps_totals():
+    state = PlayerState()
+    state.merge([record(1, kills=1), record(3, kills=3)])
+    state.merge([record(2, kills=2)])
+    assert state.match_ids == ["EUW1_3", "EUW1_2", "EUW1_1"]
+    assert state.newest_timestamp == 3 * 60_000
+    assert state.totals["kills"] == 6
+    assert state.totals["games"] == 3
+
+def test_merge_ignores_known_matches():
+    state = PlayerState()
+    state.merge([record(1), record(2)])
+    state.merge([record(2), record(1)])
+    assert len(state) == 2
+    assert state.totals["games"] == 2
+    assert state.totals["kills"] == 2
+
+def test_merge_drops_oldest_beyond_max_matches_from_totals():
+    state = PlayerState()
+    state.merge([record(n, kills=n, champion="Ahri" if n < 3 else "Zed") for n in range(1, 6)], max_matches=3)
+    assert state.match_ids == ["EUW1_5", "EUW1_4", "EUW1_3"]
+    assert state.totals["kills"] == 5 + 4 + 3
+    assert state.totals["champions"] == {"Zed": 3}
+
+def test_totals_for_covers_newest_matches():
+    records = [record(n, kills=n, champion=f"Champ{n % 2}", win=n % 3 == 0) for n in range(1, 11)]
+    state = PlayerState()
+    state.merge(records)
+    newest = sorted(records, key=lambda r: r.game_start, reverse=True)
+    for count in (1, 4, 10, 25):
+        expected = totals_of(newest[:count])
+        totals = state.totals_for(count)
+        assert {k: totals[k] for k in expected} == expected
+
+def test_unfetched_matches_count_as_listed_until_merged():
+    state = PlayerState()
+    state.merge([record(1), record(3)])
+    state.mark_unfetched(["EUW1_3", "EUW1_2", "EUW1_1"])
+    assert state.unfetched == {"EUW1_2"}
+    assert state.listed == 3
+    state.merge([record(2)])
+    assert not state.unfetched
+    assert state.listed == len(state) == 3
+
+class FakeClient(RiotAPIClient):
+    """Serves a fixed match history; match IDs in `failing` raise like a 503 after retries."""
+    def __init__(self, history: list[int]):
+        super().__init__("key")
+        self.history = [f"EUW1_{n}" for n in sorted(history, reverse=True)]
+        self.failing: set[str] = set()
+        self.listed_starts: list[int] = []
+
+    async def get_recent_match_ids(self, puuid, region, count=20, start=0, start_time=None):
+        ids = self.history
+        if start_time is not None:
+            ids = [m for m in ids if int(m.split("_")[1]) * 60 >= start_time]
+        else:
+            self.listed_starts.append(start)
+        return ids[start:start + count]
+
+    async def get_match_details(self, match_id, region):
+        if match_id in self.failing:
+            raise RuntimeError("503 Service Unavailable")
+        number = int(match_id.split("_")[1])
+        participant = {"puuid": "p", "championName": "Ahri", "win": True, "kills": number, "deaths": 1, "assists": 1,
+                       "totalMinionsKilled": 1, "neutralMinionsKilled": 0, "goldEarned": 1,
+                       "totalDamageDealtToChampions": 1, "timePlayed": 60}
+        return {"metadata": {"matchId": match_id}, "info": {"gameStartTimestamp": number * 60_000, "participants": [participant]}}
+
+def test_update_player_state_retries_failed_fetches():
+    async def scenario():
+        client = FakeClient(list(range(1, 31)))
+        client.failing = {"EUW1_28"}
+        state = await client.update_player_state("p", "euw", 5)
+        assert state.unfetched == {"EUW1_28"}
+        assert state.listed == 5
+
+        # Older games are listed after every ID the state accounts for, failed ones included
+        state = await client.update_player_state("p", "euw", 10)
+        assert client.listed_starts == [0, 5]
+        assert len(set(state.match_ids)) == len(state.match_ids) == 9
+
+        client.failing.clear()
+        state = await client.update_player_state("p", "euw", 10)
+        assert state.match_ids == client.history[:10]
+        assert state.totals_for(10)["kills"] == sum(range(21, 31))
+        assert not state.exhausted
+
+    asyncio.run(scenario())
+
+def test_history_is_only_exhausted_once_every_listed_match_was_merged():
+    async def scenario():
+        client = FakeClient(list(range(1, 6)))
+        client.failing = {"EUW1_2"}
+        state = await client.update_player_state("p", "euw", 20)
+        assert not state.exhausted
+        client.failing.clear()
+        state = await client.update_player_state("p", "euw", 20)
+        assert state.exhausted
+        assert len(state) == 5
+
+    asyncio.run(scenario())
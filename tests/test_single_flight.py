@@ -0,0 +1,92 @@
+import asyncio
+import pytest
+from rate_limiter import background_priority
+from single_flight import SingleFlight
+
+def test_concurrent_calls_share_one_task():
+    async def scenario():
+        flight = SingleFlight("test")
+        calls = []
+
+        async def work(value):
+            calls.append(value)
+            await asyncio.sleep(0.01)
+            return value
+
+        results = await asyncio.gather(*(flight.do("key", work, n) for n in range(3)))
+        assert results == [0, 0, 0]
+        assert calls == [0]
+        assert flight.stats() == {"calls": 1, "coalesced": 2, "in_flight": 0}
+
+    asyncio.run(scenario())
+
+def test_one_cancelled_caller_does_not_cancel_the_others():
+    async def scenario():
+        flight = SingleFlight("test")
+        gate = asyncio.Event()
+
+        async def work():
+            await gate.wait()
+            return "done"
+
+        first = asyncio.create_task(flight.do("key", work))
+        second = asyncio.create_task(flight.do("key", work))
+        await asyncio.sleep(0)
+        first.cancel()
+        await asyncio.sleep(0)
+        gate.set()
+        assert await second == "done"
+        with pytest.raises(asyncio.CancelledError):
+            await first
+
+    asyncio.run(scenario())
+
+def test_last_cancelled_caller_cancels_the_work_and_frees_the_key():
+    async def scenario():
+        flight = SingleFlight("test")
+        cancelled = []
+
+        async def work(value):
+            try:
+                await asyncio.sleep(0.05)
+            except asyncio.CancelledError:
+                cancelled.append(value)
+                raise
+            return value
+
+        only = asyncio.create_task(flight.do("key", work, "first"))
+        await asyncio.sleep(0)
+        only.cancel()
+        # Arrives before the cancelled task has finished: must start fresh work, not join it
+        fresh = asyncio.create_task(flight.do("key", work, "second"))
+        with pytest.raises(asyncio.CancelledError):
+            await only
+        assert await fresh == "second"
+        assert cancelled == ["first"]
+        assert flight.stats()["calls"] == 2
+
+    asyncio.run(scenario())
+
+def test_live_callers_do_not_join_background_work():
+    async def scenario():
+        flight = SingleFlight("test")
+        gate = asyncio.Event()
+
+        async def work(value):
+            await gate.wait()
+            return value
+
+        async def background_call(value):
+            background_priority.set(True)  # only in this task's context
+            return await flight.do("key", work, value)
+
+        background = asyncio.create_task(background_call("background"))
+        await asyncio.sleep(0)
+        live = asyncio.create_task(flight.do("key", work, "live"))
+        await asyncio.sleep(0)
+        late_background = asyncio.create_task(background_call("late"))  # joins the live task
+        await asyncio.sleep(0)
+        gate.set()
+        assert await asyncio.gather(background, live, late_background) == ["background", "live", "live"]
+
+    asyncio.run(scenario())
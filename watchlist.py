@@ -0,0 +1,245 @@
+import asyncio
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+from config.API_constants import *
+from metrics import metrics
+from rate_limiter import background_priority
+
+class WatchEntry:
+    __slots__ = ("puuid", "region", "label", "source", "last_lookup", "refreshed_at", "next_due")
+
+    def __init__(self, puuid: str, region: str, label: str, source: str, last_lookup: float = 0.0, refreshed_at: float = 0.0):
+        self.puuid = puuid
+        self.region = region
+        self.label = label          # Riot ID as shown to admins, e.g. "Faker#KR1"
+        self.source = source        # "admin" or "auto"
+        self.last_lookup = last_lookup
+        self.refreshed_at = refreshed_at  # wall-clock time the player's state was last brought up to date, 0 if never
+        self.next_due = 0.0               # monotonic time of the next background refresh, in the refreshing process
+
+class Watchlist:
+    """
+    Players whose match history is kept warm in the background, so lookups of them are answered
+    from the player store and match cache. Admins add players explicitly; players looked up often
+    enough are promoted automatically. `run()` refreshes due players with background rate-limit
+    priority, i.e. only with the Riot budget live lookups leave unused, and spreads the refreshes
+    over WATCHLIST_REFRESH_INTERVAL with random offsets instead of refreshing everyone at once.
+    The list and recent lookups live in SQLite, so every bot process sees the same watchlist and
+    promotions made on any shard reach the one process that refreshes; `entries` is this process's
+    copy, brought up to date by `sync()`. Player states live in each process's memory, so only the
+    refreshing process holds them warm; other processes gain the match details in the shared match
+    cache. `refreshed_at` is therefore only advanced by that process, and lookups elsewhere don't
+    postpone its refreshes.
+    """
+    def __init__(self, riot_api_client, path: str = WATCHLIST_PATH):
+        self.client = riot_api_client
+        self.path = path
+        self.entries: dict[str, WatchEntry] = {}
+        self.logger = logging.getLogger(__name__)
+        self.refreshing = False  # True in the one process running run()
+        self._lock = threading.Lock()
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # Used from worker threads via asyncio.to_thread, guarded by self._lock; transactions are explicit.
+        self._conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS watchlist ("
+            "puuid TEXT PRIMARY KEY, "
+            "region TEXT NOT NULL, "
+            "label TEXT NOT NULL, "
+            "source TEXT NOT NULL, "
+            "last_lookup REAL NOT NULL, "
+            "refreshed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE TABLE IF NOT EXISTS lookups (puuid TEXT NOT NULL, at REAL NOT NULL)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS lookups_puuid ON lookups (puuid)")
+        self._sync_rows(self._rows(), initial=True)
+
+    # ----------------- Storage -----------------
+    def _rows(self) -> list[tuple]:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT puuid, region, label, source, last_lookup, refreshed_at FROM watchlist"
+            ).fetchall()
+
+    def _sync_rows(self, rows: list[tuple], initial: bool = False):
+        """Make `entries` match the database rows, keeping this process's refresh schedule."""
+        now = time.monotonic()
+        seen = set()
+        for puuid, region, label, source, last_lookup, refreshed_at in rows:
+            seen.add(puuid)
+            entry = self.entries.get(puuid)
+            if entry is None:
+                entry = self.entries[puuid] = WatchEntry(puuid, region, label, source, last_lookup, refreshed_at)
+                if refreshed_at:
+                    entry.next_due = now + max(0.0, WATCHLIST_REFRESH_INTERVAL - (time.time() - refreshed_at))
+                elif initial:
+                    # A random first refresh time spreads a freshly loaded list over one interval
+                    entry.next_due = now + random.uniform(0, WATCHLIST_REFRESH_INTERVAL)
+                else:
+                    entry.next_due = now  # added by an admin: warm right away
+                continue
+            entry.source, entry.last_lookup = source, last_lookup
+            if refreshed_at > entry.refreshed_at:
+                # Refreshed by the process that owned the refreshes before, e.g. before a restart
+                entry.refreshed_at = refreshed_at
+                entry.next_due = max(entry.next_due, now + WATCHLIST_REFRESH_INTERVAL - (time.time() - refreshed_at))
+        for puuid in set(self.entries) - seen:
+            del self.entries[puuid]
+
+    async def sync(self):
+        """Bring `entries` up to date with changes made by other processes."""
+        self._sync_rows(await asyncio.to_thread(self._rows))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    # ----------------- Membership -----------------
+    def _add(self, puuid: str, region: str, label: str) -> bool:
+        with self._lock:
+            inserted = self._conn.execute(
+                "INSERT OR IGNORE INTO watchlist (puuid, region, label, source, last_lookup, refreshed_at) VALUES (?, ?, ?, 'admin', ?, 0)",
+                (puuid, region, label, time.time()),
+            ).rowcount
+            if not inserted:
+                self._conn.execute("UPDATE watchlist SET source = 'admin' WHERE puuid = ?", (puuid,))  # an admin add pins auto entries
+        return bool(inserted)
+
+    async def add(self, puuid: str, region: str, label: str) -> bool:
+        """Watch a player on an admin's request; returns False if they were already watched."""
+        added = await asyncio.to_thread(self._add, puuid, region, label)
+        await self.sync()
+        return added
+
+    def _remove(self, puuid: str) -> bool:
+        with self._lock:
+            return bool(self._conn.execute("DELETE FROM watchlist WHERE puuid = ?", (puuid,)).rowcount)
+
+    async def remove(self, puuid: str) -> bool:
+        removed = await asyncio.to_thread(self._remove, puuid)
+        await self.sync()
+        return removed
+
+    def _record_lookup(self, puuid: str, region: str, label: str) -> tuple[str, int]:
+        """Returns ("hit" | "stale" | "unwatched" | "promoted", lookups counted towards promotion)."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute("SELECT refreshed_at FROM watchlist WHERE puuid = ?", (puuid,)).fetchone()
+                if row is not None:
+                    self._conn.execute("UPDATE watchlist SET last_lookup = ? WHERE puuid = ?", (now, puuid))
+                    result, count = ("hit" if now - row[0] < WATCHLIST_REFRESH_INTERVAL else "stale"), 0
+                else:
+                    self._conn.execute("INSERT INTO lookups (puuid, at) VALUES (?, ?)", (puuid, now))
+                    count = self._conn.execute(
+                        "SELECT COUNT(*) FROM lookups WHERE puuid = ? AND at > ?", (puuid, now - WATCHLIST_PROMOTE_WINDOW)
+                    ).fetchone()[0]
+                    auto = self._conn.execute("SELECT COUNT(*) FROM watchlist WHERE source = 'auto'").fetchone()[0]
+                    result = "unwatched"
+                    if count >= WATCHLIST_PROMOTE_LOOKUPS and auto < WATCHLIST_MAX_AUTO:
+                        self._conn.execute("DELETE FROM lookups WHERE puuid = ?", (puuid,))
+                        self._conn.execute(
+                            "INSERT INTO watchlist (puuid, region, label, source, last_lookup, refreshed_at) VALUES (?, ?, ?, 'auto', ?, 0)",
+                            (puuid, region, label, now),  # never refreshed: the refreshing process warms them right away
+                        )
+                        result = "promoted"
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return result, count
+
+    async def record_lookup(self, puuid: str, region: str, label: str):
+        """Count a live lookup: tracks the watchlist hit rate and promotes frequently looked-up players."""
+        try:
+            result, count = await asyncio.to_thread(self._record_lookup, puuid, region, label)
+        except sqlite3.Error as e:
+            self.logger.warning(f"Could not record watchlist lookup of {label}: {e}")
+            return
+        if result == "promoted":
+            metrics.inc("watchlist_lookups_total", result="unwatched")
+            metrics.inc("watchlist_promotions_total")
+            self.logger.info(f"Promoted {label} to the watchlist after {count} lookups")
+            return
+        metrics.inc("watchlist_lookups_total", result=result)
+        entry = self.entries.get(puuid)
+        if self.refreshing and entry is not None:
+            # The lookup brought this process's state of the player up to date, which is what a refresh does
+            entry.refreshed_at = time.time()
+            entry.next_due = time.monotonic() + WATCHLIST_REFRESH_INTERVAL * random.uniform(0.9, 1.1)
+            try:
+                await asyncio.to_thread(self._mark_refreshed, puuid, entry.refreshed_at)
+            except sqlite3.Error as e:
+                self.logger.warning(f"Could not record watchlist lookup of {label}: {e}")
+
+    def _expire(self) -> int:
+        """Drop automatically added players nobody has looked up for WATCHLIST_AUTO_EXPIRY seconds."""
+        now = time.time()
+        with self._lock:
+            expired = self._conn.execute(
+                "DELETE FROM watchlist WHERE source = 'auto' AND last_lookup < ?", (now - WATCHLIST_AUTO_EXPIRY,)
+            ).rowcount
+            self._conn.execute("DELETE FROM lookups WHERE at < ?", (now - WATCHLIST_PROMOTE_WINDOW,))
+        return expired
+
+    # ----------------- Refreshing -----------------
+    def _mark_refreshed(self, puuid: str, refreshed_at: float):
+        with self._lock:
+            self._conn.execute("UPDATE watchlist SET refreshed_at = MAX(refreshed_at, ?) WHERE puuid = ?", (refreshed_at, puuid))
+
+    async def refresh(self, entry: WatchEntry):
+        """Fetch the player's new matches and summoner profile with background priority."""
+        token = background_priority.set(True)
+        try:
+            with metrics.span("watchlist_refresh"):
+                await self.client.get_summoner_info_from_puuid(entry.puuid, entry.region, refresh=True)
+                await self.client.update_player_state(entry.puuid, entry.region, WATCHLIST_MATCH_COUNT)
+            metrics.inc("watchlist_refreshes_total", result="ok")
+            refreshed = True
+        except Exception as e:
+            metrics.inc("watchlist_refreshes_total", result="error")
+            self.logger.warning(f"Watchlist refresh of {entry.label} failed: {e}")
+            refreshed = False
+        finally:
+            background_priority.reset(token)
+        # +-10% jitter keeps refreshes from lining up again after a burst
+        entry.next_due = time.monotonic() + WATCHLIST_REFRESH_INTERVAL * random.uniform(0.9, 1.1)
+        if not refreshed:
+            return  # the player's data is as old as before; lookups of them must not count as hits
+        entry.refreshed_at = time.time()
+        try:
+            await asyncio.to_thread(self._mark_refreshed, entry.puuid, entry.refreshed_at)
+        except sqlite3.Error as e:
+            self.logger.warning(f"Could not record the watchlist refresh of {entry.label}: {e}")
+
+    async def run(self):
+        """Refresh due players forever, at most WATCHLIST_REFRESHES_PER_TICK every WATCHLIST_TICK seconds."""
+        self.refreshing = True
+        while True:
+            try:
+                await asyncio.to_thread(self._expire)
+                await self.sync()
+            except sqlite3.Error as e:
+                self.logger.warning(f"Could not read the watchlist: {e}")
+            now = time.monotonic()
+            due = sorted((e for e in self.entries.values() if e.next_due <= now), key=lambda e: e.next_due)
+            for entry in due[:WATCHLIST_REFRESHES_PER_TICK]:
+                await self.refresh(entry)
+            await asyncio.sleep(WATCHLIST_TICK)
+
+    def stats(self) -> dict[str, int]:
+        now = time.monotonic()
+        auto = sum(entry.source == "auto" for entry in self.entries.values())
+        return {
+            "admin": len(self.entries) - auto,
+            "auto": auto,
+            "due": sum(entry.next_due <= now for entry in self.entries.values()),
+        }